@@ -4,6 +4,8 @@ from rest_framework.validators import UniqueValidator
 from django.conf import settings
 from urllib.parse import urljoin
 
+from restify.media import MediaImageField
+
 from .models import User, UserProfile
 
 
@@ -108,7 +110,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     user_id = serializers.CharField(max_length=150, required=False, read_only=True)
     phone = serializers.CharField(max_length=10, required=False)
     date_of_birth = serializers.DateField(required=False)
-    avatar = serializers.ImageField(required=False)
+    avatar = MediaImageField(required=False)
     gender = serializers.CharField(required=False)
     rating = serializers.DecimalField(decimal_places=1, max_digits=2, required=False)
 
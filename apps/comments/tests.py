@@ -1,3 +1,41 @@
+import datetime
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.properties.models import Property
+from apps.reservations.models import Reservation
+from .models import Comments
 
 # Create your tests here.
+
+
+class CommentConditionalGetTest(TestCase):
+    """
+    Conditional requests are only answered with 304 for a comment that exists
+    """
+
+    def setUp(self):
+        self.tenant = User.objects.create_user(email='tenant@example.com', password='password',
+                                               first_name='Tenant', last_name='User')
+        self.property = Property.objects.create(owner=self.tenant, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        reservation = Reservation.objects.create(tenant=self.tenant, property=self.property, status='Completed',
+                                                 start_date=datetime.date(2030, 1, 1),
+                                                 end_date=datetime.date(2030, 1, 3))
+        self.comment = Comments.objects.create(user=self.tenant, reservation=reservation,
+                                               property=self.property, content='Lovely', rating=5)
+        self.client = APIClient()
+
+    def test_missing_comment_is_not_found(self):
+        response = self.client.get('/api/comments/get/%d' % (self.comment.id + 1), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unchanged_comment_is_not_modified(self):
+        url = '/api/comments/get/%d' % self.comment.id
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
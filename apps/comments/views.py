@@ -12,6 +12,7 @@ from rest_framework_simplejwt import authentication
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.shortcuts import get_object_or_404
+from restify.conditional import not_modified, queryset_validators, set_validators
 
 # Create your views here.
 
@@ -36,12 +37,12 @@ class CommentsDetails(APIView):
     def get(self, request, reservation_id):
         try:
             # Check if the reservation exists
-            reservation = Reservation.objects.get(id=reservation_id)
+            reservation = Reservation.objects.get(id=reservation_id, property__is_deleted=False)
         except Reservation.DoesNotExist:
             # Return a 404 response if the reservation does not exist
             return Response({'detail': 'Reservation not found.'}, status=404)
         # Get all comments for the given reservation
-        comments = Comments.objects.filter(reservation=reservation_id)
+        comments = Comments.objects.filter(reservation=reservation)
         if not comments:
             # Return a 404 response if no comments are found
             return Response({'detail': 'Comments not found.'}, status=404)
@@ -72,7 +73,7 @@ class CommentCreate(APIView):
         if serializer.is_valid():
             try:
                 # Check if the reservation exists
-                reservation = Reservation.objects.get(id=reservation_id)
+                reservation = Reservation.objects.get(id=reservation_id, property__is_deleted=False)
             except Reservation.DoesNotExist:
                 # Return a 404 response if the reservation does not exist
                 return Response({'detail': 'Reservation not found.'}, status=404)
@@ -126,7 +127,7 @@ class CommentUD(APIView):
     )
     def patch(self, request, comment_id):
         try:
-            comment = Comments.objects.get(id=comment_id)
+            comment = Comments.objects.get(id=comment_id, property__is_deleted=False)
         except Comments.DoesNotExist:
             return Response({'detail': 'Comment not found.'}, status=404)
         # if comment exist, update it
@@ -153,7 +154,7 @@ class CommentUD(APIView):
     def delete(self, request, comment_id):
         user = request.user
         try:
-            comment = Comments.objects.get(id=comment_id)
+            comment = Comments.objects.get(id=comment_id, property__is_deleted=False)
         except Comments.DoesNotExist:
             return Response({'detail': 'Comment not found.'}, status=404)
         # if comment exist, delete it
@@ -175,6 +176,7 @@ class PropertyComments(APIView):
                                              type=openapi.TYPE_STRING)],
         responses={
             '404': 'Property Not Found',
+            '304': 'Not Modified',
             '200': CommentSerializer
         }
     )
@@ -187,8 +189,12 @@ class PropertyComments(APIView):
             return Response({'detail': 'Property not found.'}, status=404)
         reservations = Reservation.objects.filter(property=property_id)
         comments = Comments.objects.filter(reservation__in=reservations)
+        validators = queryset_validators(request, comments, 'date_modified', last_modified=False)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
         serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), validators)
 
 
 class getOneComment(APIView):
@@ -196,14 +202,19 @@ class getOneComment(APIView):
     pk_url_kwarg = 'comment_id'
 
     def get(self, request, comment_id):
+        queryset = Comments.objects.filter(id=comment_id, property__is_deleted=False)
         try:
-            # Check if the property exists
-            comment = Comments.objects.get(id=comment_id)
+            # Check if the comment exists before answering a conditional request for it
+            comment = queryset.get()
         except Comments.DoesNotExist:
-            # Return a 404 response if the property does not exist
+            # Return a 404 response if the comment does not exist
             return Response({'detail': 'Comment not found.'}, status=404)
+        validators = queryset_validators(request, queryset, 'date_modified')
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
         serializer = CommentSerializer(comment)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), validators)
 
 
 
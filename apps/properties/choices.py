@@ -10,6 +10,18 @@ AMENITY_CHOICES = (
     ('wifi', 'Wi-Fi')
 )
 
+# Bit assigned to each amenity in Property.amenities_mask. Append new amenities, never reorder.
+AMENITY_BITS = {value: 1 << position for position, (value, _) in enumerate(AMENITY_CHOICES)}
+
+# Nightly price ranges counted by the search facets endpoint, lower bound inclusive
+PRICE_BUCKETS = (
+    (0, 100),
+    (100, 200),
+    (200, 300),
+    (300, 500),
+    (500, None)
+)
+
 PROVINCE_CHOICES = (
     ('AB', 'Alberta'),
     ('BC', 'British Columbia'),
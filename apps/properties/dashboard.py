@@ -0,0 +1,44 @@
+from django.db.models import Avg, Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Property
+from ..comments.models import Comments
+from ..reservations.models import Reservation
+
+# Newest listings first; property_id is unique, as keyset pagination requires
+DASHBOARD_ORDERING = [('property_id', True)]
+
+
+def _per_property(queryset, aggregate):
+    """
+    Correlated subquery computing aggregate over the rows of queryset belonging to the outer property.
+
+    A subquery per statistic keeps each one independent; joining reservations
+    and comments in one GROUP BY would multiply their rows into each other.
+    """
+    return Subquery(
+        queryset.filter(property=OuterRef('pk')).order_by().values('property').annotate(value=aggregate).values('value')
+    )
+
+
+def host_dashboard(owner, today=None):
+    """
+    The owner's properties annotated with their booking and review statistics, in one query
+    """
+    today = today or timezone.localdate()
+    reservations = Reservation.objects.all()
+    upcoming = reservations.filter(status='Approved', start_date__gte=today)
+
+    def count(queryset):
+        return Coalesce(_per_property(queryset, Count('pk')), 0, output_field=IntegerField())
+
+    return Property.objects.filter(owner=owner).annotate(
+        pending_reservations=count(reservations.filter(status='Pending')),
+        approved_reservations=count(reservations.filter(status='Approved')),
+        completed_reservations=count(reservations.filter(status='Completed')),
+        upcoming_check_ins=count(upcoming),
+        next_check_in=Subquery(upcoming.filter(property=OuterRef('pk')).order_by('start_date').values('start_date')[:1]),
+        comment_count=count(Comments.objects.all()),
+        average_rating=_per_property(Comments.objects.filter(rating__isnull=False), Avg('rating')),
+    )
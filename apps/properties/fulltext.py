@@ -0,0 +1,115 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'properties_property_fts'
+GIN_INDEX = 'properties_property_fts_idx'
+
+# Text indexed for keyword search; the Postgres expression must match the GIN index exactly
+PG_DOCUMENT = "to_tsvector('english', \"properties_property\".\"title\" || ' ' || " \
+              "\"properties_property\".\"address\" || ' ' || \"properties_property\".\"city\")"
+INDEXED_FIELDS = ('title', 'address', 'city')
+
+_fts_available = None
+
+
+def tokenize(text):
+    """
+    Split free text into lower-case word tokens, dropping query syntax characters
+    """
+    return re.findall(r'\w+', (text or '').casefold())
+
+
+def uses_fts5():
+    """
+    Whether the SQLite shadow table exists, i.e. migration 0006 could create it
+    """
+    global _fts_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_available is None:
+        _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON properties_property USING GIN (%s)'
+                              % (GIN_INDEX, PG_DOCUMENT.replace('"properties_property".', '')))
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+            if cursor.fetchone() is None:
+                # search() falls back to LIKE matching without FTS5
+                return
+        schema_editor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(title, address, city, "
+                              "tokenize = 'porter unicode61')" % FTS_TABLE)
+        schema_editor.execute('INSERT INTO %s (rowid, title, address, city) '
+                              'SELECT property_id, title, address, city FROM properties_property' % FTS_TABLE)
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % GIN_INDEX)
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+
+
+def sync_property(property):
+    """
+    Copy a saved property's text into the SQLite shadow table; Postgres indexes the row itself
+    """
+    if uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO %s (rowid, title, address, city) VALUES (%%s, %%s, %%s, %%s)'
+                           % FTS_TABLE, [property.pk, property.title, property.address, property.city])
+
+
+def remove_property(property_id):
+    if uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [property_id])
+
+
+def search(queryset, text):
+    """
+    Restrict queryset to properties matching every word of text, annotated with search_rank.
+
+    search_rank is higher for better matches on every backend.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return queryset.none()
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join('%s:*' % token for token in tokens)
+        return queryset.filter(
+            RawSQL("%s @@ to_tsquery('english', %%s)" % PG_DOCUMENT, (tsquery,), output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL("ts_rank(%s, to_tsquery('english', %%s))" % PG_DOCUMENT, (tsquery,),
+                               output_field=FloatField())
+        )
+
+    if uses_fts5():
+        match = ' '.join('"%s"*' % token for token in tokens)
+        return queryset.filter(
+            RawSQL('"properties_property"."property_id" IN (SELECT rowid FROM %s WHERE %s MATCH %%s)'
+                   % (FTS_TABLE, FTS_TABLE), (match,), output_field=BooleanField())
+        ).annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL('(SELECT -bm25(%s) FROM %s WHERE %s MATCH %%s AND rowid = "properties_property"."property_id")'
+                               % (FTS_TABLE, FTS_TABLE, FTS_TABLE), (match,), output_field=FloatField())
+        )
+
+    # Backends without a text index: every word must appear in one of the fields
+    for token in tokens:
+        condition = Q()
+        for field in INDEXED_FIELDS:
+            condition |= Q(**{'%s__icontains' % field: token})
+        queryset = queryset.filter(condition)
+    return queryset.annotate(search_rank=RawSQL('0', (), output_field=FloatField()))
@@ -0,0 +1,112 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode a coordinate as a geohash; every prefix of the result is an enclosing cell
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size_degrees(precision):
+    """
+    (height, width) in degrees of a geohash cell of the given precision
+    """
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose cells together cover the circle, or [] when the circle is too large.
+
+    Picks the finest precision whose cells are at least radius_km on each
+    side; the circle then lies within the 3x3 block around its centre cell.
+    """
+    shrink = max(math.cos(math.radians(latitude)), 1e-6)
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size_degrees(candidate)
+        if height * KM_PER_DEGREE < radius_km or width * KM_PER_DEGREE * shrink < radius_km:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+    height, width = cell_size_degrees(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lng_step in (-1, 0, 1):
+            cell_latitude = min(max(latitude + lat_step * height, -90.0), 90.0)
+            cell_longitude = (longitude + lng_step * width + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(cell_latitude, cell_longitude, precision))
+    return sorted(cells)
+
+
+def cell_filter(cells):
+    """
+    Q matching geohashes under any of the cells, as index range scans
+    """
+    condition = Q()
+    for cell in cells:
+        # '{' sorts right after 'z', the last geohash character
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + '{')
+    return condition
+
+
+def distance_km(latitude, longitude):
+    """
+    Haversine great-circle distance in km from the given point to each row
+    """
+    half_dlat = Radians(F('latitude') - latitude) / 2
+    half_dlng = Radians(F('longitude') - longitude) / 2
+    chord = Power(Sin(half_dlat), 2) + Value(math.cos(math.radians(latitude))) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlng), 2)
+    # Rounding can push the chord marginally above 1, outside the domain of asin
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(chord), Value(1.0)), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km=None):
+    """
+    Annotate distance_km and, with a radius, keep only rows inside it
+    """
+    queryset = queryset.filter(latitude__isnull=False, longitude__isnull=False)
+    if radius_km is not None:
+        cells = covering_cells(latitude, longitude, radius_km)
+        if cells:
+            queryset = queryset.filter(cell_filter(cells))
+    queryset = queryset.annotate(distance_km=distance_km(latitude, longitude))
+    if radius_km is not None:
+        queryset = queryset.filter(distance_km__lte=radius_km)
+    return queryset
+
+
+def within_bbox(queryset, min_longitude, min_latitude, max_longitude, max_latitude):
+    queryset = queryset.filter(latitude__gte=min_latitude, latitude__lte=max_latitude)
+    if min_longitude <= max_longitude:
+        return queryset.filter(longitude__gte=min_longitude, longitude__lte=max_longitude)
+    # The box crosses the antimeridian
+    return queryset.filter(Q(longitude__gte=min_longitude) | Q(longitude__lte=max_longitude))
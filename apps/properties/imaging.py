@@ -0,0 +1,149 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from restify import tasks
+from restify.media import absolute_media_url
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (320, 800, 1600)
+# (format key, Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+DEFAULT_IMAGE_NAME = 'default_property_image'
+
+
+def derivative_name(source_name, width, extension):
+    stem, _ = os.path.splitext(source_name)
+    directory, filename = os.path.split(stem)
+    return os.path.join(directory, 'derivatives', '%s_%dw.%s' % (filename, width, extension))
+
+
+def render_derivatives(field_file):
+    """
+    Resize an uploaded image to each derivative width and format and store the results.
+
+    Returns {'source': name, 'webp': {'320': name, ...}, 'jpeg': {...}}.
+    Widths above the original are skipped, except that an image narrower
+    than every width still gets one derivative at its own size.
+    """
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    widths = [width for width in DERIVATIVE_WIDTHS if width <= image.width] or [image.width]
+    derivatives = {'source': field_file.name}
+    for key, _, _, _ in DERIVATIVE_FORMATS:
+        derivatives[key] = {}
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for key, pillow_format, extension, options in DERIVATIVE_FORMATS:
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            name = default_storage.save(derivative_name(field_file.name, width, extension),
+                                        ContentFile(buffer.getvalue()))
+            derivatives[key][str(width)] = name
+    return derivatives
+
+
+def has_source(field_file):
+    return bool(field_file) and field_file.name != DEFAULT_IMAGE_NAME
+
+
+def generate_image_derivatives(image_id):
+    from .models import PropertyImage
+
+    image = PropertyImage.objects.filter(pk=image_id).first()
+    if image is None or not has_source(image.image):
+        return
+    try:
+        derivatives = render_derivatives(image.image)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Could not create derivatives of property image %s', image_id, exc_info=True)
+        return
+    # The image may have been replaced while this task ran; keep the newer upload's derivatives
+    PropertyImage.objects.filter(pk=image_id, image=image.image.name).update(
+        derivatives=derivatives, updated_at=timezone.now())
+
+
+def generate_thumbnail_derivatives(property_id):
+    from .models import Property
+    from .search import search_cache
+
+    property = Property.objects.filter(pk=property_id).only('thumbnail', 'province', 'city').first()
+    if property is None or not has_source(property.thumbnail):
+        return
+    try:
+        derivatives = render_derivatives(property.thumbnail)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Could not create derivatives of property %s thumbnail', property_id, exc_info=True)
+        return
+    updated = Property.objects.filter(pk=property_id, thumbnail=property.thumbnail.name).update(
+        thumbnail_derivatives=derivatives, last_modified=timezone.now())
+    if updated:
+        # update() sends no signals; cached search pages embed the thumbnail srcset
+        search_cache.invalidate([(property.province, property.city)])
+
+
+def stored_file_names(name, derivatives):
+    """
+    Storage names of an uploaded file and its derivatives, leaving out the shared default image
+    """
+    if not name or name == DEFAULT_IMAGE_NAME:
+        return []
+    names = [name]
+    if derivatives and derivatives.get('source') == name:
+        for key, _, _, _ in DERIVATIVE_FORMATS:
+            names.extend(derivatives.get(key, {}).values())
+    return names
+
+
+def delete_stored_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.warning('Could not delete stored file %s', name, exc_info=True)
+
+
+def schedule_file_deletion(names):
+    """
+    Delete the given storage objects in the background once the current transaction commits
+    """
+    names = list(names)
+    if names:
+        tasks.submit(delete_stored_files, names)
+
+
+def schedule_image_derivatives(image_id):
+    tasks.submit(generate_image_derivatives, image_id)
+
+
+def schedule_thumbnail_derivatives(property_id):
+    tasks.submit(generate_thumbnail_derivatives, property_id)
+
+
+def srcset(derivatives, source_name, request=None):
+    """
+    {'webp': {'320': url, ...}, 'jpeg': {...}} for derivatives of source_name, or {} if none are ready
+    """
+    if not derivatives or derivatives.get('source') != source_name:
+        return {}
+    urls = {}
+    for key, _, _, _ in DERIVATIVE_FORMATS:
+        urls[key] = {}
+        for width, name in derivatives.get(key, {}).items():
+            urls[key][width] = absolute_media_url(name, request)
+    return urls
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework import serializers
+
+from apps.properties.serializers import PropertyCardSerializer, PropertySerializer
+from restify.media import media_url
+
+from .benchmark_property_serializers import Command as SerializerBenchmarkCommand
+
+
+class StoragePropertySerializer(PropertySerializer):
+    """
+    PropertySerializer as it was before restify.media: one storage url() call per row
+    """
+    thumbnail = serializers.ImageField()
+
+
+class Command(SerializerBenchmarkCommand):
+    help = "Time a search page of properties with thumbnail URLs from the storage backend versus " \
+           "restify.media. Rows are built in memory, so only URL building and serialization are measured."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--base-url', default=getattr(settings, 'MEDIA_PUBLIC_BASE_URL', None)
+                            or 'https://storage.googleapis.com/benchmark-bucket/',
+                            help="MEDIA_PUBLIC_BASE_URL used for the precomputed variants")
+
+    def handle(self, *args, **options):
+        instances = self.build(options['rows'])
+        context = {'request': RequestFactory().get('/properties/search/')}
+        self.stdout.write("Serializing %d properties with %s, best of %d"
+                          % (len(instances), default_storage.__class__.__name__, options['repeat']))
+        self.timed("storage url() per row", instances, options['repeat'],
+                   lambda rows: StoragePropertySerializer(rows, many=True, context=context))
+        media_url.cache_clear()
+        self.timed("media_url, storage fallback", instances, options['repeat'],
+                   lambda rows: PropertySerializer(rows, many=True, context=context))
+        with override_settings(MEDIA_PUBLIC_BASE_URL=options['base_url']):
+            media_url.cache_clear()
+            self.timed("media_url, cold cache", instances, 1,
+                       lambda rows: PropertySerializer(rows, many=True, context=context))
+            self.timed("media_url, warm cache", instances, options['repeat'],
+                       lambda rows: PropertySerializer(rows, many=True, context=context))
+            self.timed("card view, warm cache", instances, options['repeat'],
+                       lambda rows: PropertyCardSerializer(rows, many=True, context=context))
+        media_url.cache_clear()
@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from apps.properties.choices import AMENITY_CHOICES
+from apps.properties.models import Property
+from apps.properties.serializers import PropertyCardSerializer, PropertySerializer
+
+
+class Command(BaseCommand):
+    help = "Time serializing a listing page with the full, sparse and card property serializers. " \
+           "Rows are built in memory, so only serialization cost is measured."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--fields', default='property_id,title,city,price,thumbnail,rating',
+                            help="Field subset used for the sparse variants")
+
+    def build(self, rows):
+        rng = random.Random(0)
+        amenities = [value for value, _ in AMENITY_CHOICES]
+        return [
+            Property(property_id=i + 1, owner_id=1, title='Benchmark %d' % i, address='%d Main St' % i,
+                     city='Toronto', province='ON', postal_code='M5V', price=rng.randint(50, 900),
+                     property_type='condo', num_bedrooms=rng.randint(1, 5), sqft=700,
+                     amenities=rng.sample(amenities, rng.randint(0, len(amenities))),
+                     thumbnail='property_thumbnails/%d.jpg' % i, rating=None)
+            for i in range(rows)
+        ]
+
+    def timed(self, label, instances, repeat, make_serializer):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            make_serializer(instances).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write("%-32s %8.2f ms total %8.2f us/row" % (label, best * 1000, best * 1e6 / len(instances)))
+
+    def handle(self, *args, **options):
+        instances = self.build(options['rows'])
+        fields = [name.strip() for name in options['fields'].split(',') if name.strip()]
+        context = {'request': RequestFactory().get('/properties/search/')}
+        self.stdout.write("Serializing %d properties, best of %d" % (len(instances), options['repeat']))
+        self.timed("PropertySerializer (full)", instances, options['repeat'],
+                   lambda rows: PropertySerializer(rows, many=True, context=context))
+        self.timed("PropertySerializer (sparse)", instances, options['repeat'],
+                   lambda rows: PropertySerializer(rows, many=True, fields=fields, context=context))
+        self.timed("PropertyCardSerializer", instances, options['repeat'],
+                   lambda rows: PropertyCardSerializer(rows, many=True, context=context))
+        self.timed("PropertyCardSerializer (sparse)", instances, options['repeat'],
+                   lambda rows: PropertyCardSerializer(rows, many=True, fields=fields, context=context))
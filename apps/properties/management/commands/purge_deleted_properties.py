@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.properties.purge import purge_deleted_properties
+
+
+class Command(BaseCommand):
+    help = "Delete soft-deleted properties and their reservations, comments and images in batches. " \
+           "Deletion normally runs in the background after a property is deleted; this catches up " \
+           "on purges that were interrupted."
+
+    def handle(self, *args, **options):
+        results = purge_deleted_properties()
+        for property_id, counts in results.items():
+            self.stdout.write("Purged property %s: %s" % (property_id, counts))
+        self.stdout.write("Purged %d properties" % len(results))
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+def backfill_amenities_mask(apps, schema_editor):
+    from apps.properties.models import amenities_to_mask
+
+    Property = apps.get_model('properties', 'Property')
+    batch = []
+    for property in Property.objects.only('property_id', 'amenities').iterator(chunk_size=1000):
+        property.amenities_mask = amenities_to_mask(property.amenities)
+        batch.append(property)
+        if len(batch) == 1000:
+            Property.objects.bulk_update(batch, ['amenities_mask'])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ['amenities_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_rename_property_id_propertyimage_property'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='amenities_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenities_mask, migrations.RunPython.noop),
+    ]
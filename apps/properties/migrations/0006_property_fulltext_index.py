@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    from apps.properties.fulltext import create_index
+
+    create_index(schema_editor)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    from apps.properties.fulltext import drop_index
+
+    drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_property_amenities_mask'),
+    ]
+
+    operations = [
+        # Postgres: GIN expression index over title/address/city. SQLite: FTS5 shadow table
+        # kept in sync by apps.properties.signals.
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
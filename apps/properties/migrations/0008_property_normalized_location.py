@@ -0,0 +1,48 @@
+# Generated by Django 4.1.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+def backfill_normalized_location(apps, schema_editor):
+    from apps.properties.models import normalize_location
+
+    Property = apps.get_model('properties', 'Property')
+    batch = []
+    for property in Property.objects.only('property_id', 'city', 'province').iterator(chunk_size=1000):
+        property.city_normalized = normalize_location(property.city)
+        property.province_normalized = normalize_location(property.province)
+        batch.append(property)
+        if len(batch) == 1000:
+            Property.objects.bulk_update(batch, ['city_normalized', 'province_normalized'])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ['city_normalized', 'province_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_property_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='city_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='province_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(backfill_normalized_location, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['city_normalized', 'price', 'rating'], name='property_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['province_normalized', 'price', 'rating'], name='property_province_price_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_property_normalized_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='thumbnail_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,12 +1,45 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from multiselectfield import MultiSelectField
 
 from apps.accounts.models import User
-from apps.properties.choices import AMENITY_CHOICES, PROVINCE_CHOICES,  PROPERTY_TYPE_CHOICES
+from apps.properties.choices import AMENITY_BITS, AMENITY_CHOICES, PROVINCE_CHOICES,  PROPERTY_TYPE_CHOICES
+from apps.properties.geo import geohash_encode
 
 # Create your models here.
 
+def normalize_location(value):
+    """
+    Case- and whitespace-insensitive form of a city or province, as stored in the *_normalized columns
+    """
+    return ' '.join((value or '').split()).casefold()
+
+
+def amenities_to_mask(amenities):
+    """
+    Fold a collection of amenity values (or a comma-separated string) into a bitmask
+    """
+    if not amenities:
+        return 0
+    if isinstance(amenities, str):
+        amenities = amenities.split(',')
+    mask = 0
+    for amenity in amenities:
+        mask |= AMENITY_BITS.get(amenity, 0)
+    return mask
+
+
+class PropertyManager(models.Manager):
+    """
+    Default manager hiding soft-deleted properties
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Property(models.Model):
     """
     Model that stores the property information
@@ -24,15 +57,80 @@ class Property(models.Model):
     num_bedrooms = models.IntegerField(blank=False, null=False)
     sqft = models.IntegerField(blank=False, null=False)
     amenities = MultiSelectField(max_length=200, choices=AMENITY_CHOICES, blank=True, null=True)
+    # Mirror of amenities as bits from AMENITY_BITS, maintained by save() for search
+    amenities_mask = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False)
     thumbnail = models.ImageField(blank=True, default='default_property_image', upload_to='property_thumbnails')
+    # Resized copies of the thumbnail, written by imaging.generate_thumbnail_derivatives()
+    thumbnail_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     rating = models.DecimalField(max_digits=2, decimal_places=1, blank=True, null=True, default=None)
 
+    latitude = models.FloatField(blank=True, null=True,
+                                 validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(blank=True, null=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Geohash of latitude/longitude, maintained by save() for the radius search cell prefilter
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+
+    # normalize_location() of city/province, maintained by save() for indexed equality filters
+    city_normalized = models.CharField(max_length=150, blank=True, default='', editable=False)
+    province_normalized = models.CharField(max_length=150, blank=True, default='', editable=False)
+
     time_created = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
 
+    # Set by soft_delete(); the row and its dependents are removed later by purge.purge_property()
+    is_deleted = models.BooleanField(default=False, db_index=True, editable=False)
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = PropertyManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='property_lat_lng_idx'),
+            models.Index(fields=['city_normalized', 'price', 'rating'], name='property_city_price_idx'),
+            models.Index(fields=['province_normalized', 'price', 'rating'], name='property_province_price_idx'),
+        ]
+
     def __str__(self):
         return self.title + "of" + str(self.owner.id)
 
+    # Columns derived in save() from the fields they mirror
+    DERIVED_FIELDS = {
+        'amenities': ('amenities_mask', ),
+        'latitude': ('geohash', ),
+        'longitude': ('geohash', ),
+        'city': ('city_normalized', ),
+        'province': ('province_normalized', ),
+    }
+
+    def soft_delete(self):
+        """
+        Hide the property from every read now and queue the purge of it and its dependents
+        """
+        from . import purge
+
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_deleted', 'deleted_at'])
+        purge.schedule_purge(self.pk)
+
+    def save(self, *args, **kwargs):
+        self.amenities_mask = amenities_to_mask(self.amenities)
+        self.city_normalized = normalize_location(self.city)
+        self.province_normalized = normalize_location(self.province)
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for field in list(update_fields):
+                update_fields.update(self.DERIVED_FIELDS.get(field, ()))
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
 
 class PropertyImage(models.Model):
     """
@@ -42,6 +140,9 @@ class PropertyImage(models.Model):
 
     image = models.ImageField(blank=False, default='default_property_image', upload_to='property_images')
     image_name = models.CharField(max_length=150, blank=False, null=False)
+    # Resized copies of the image, written by imaging.generate_image_derivatives()
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.image_name + "of" + str(self.property.id)
@@ -0,0 +1,86 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from restify import tasks
+
+from . import fulltext, imaging
+from .models import Property, PropertyImage
+from ..comments.models import Comments
+from ..reservations import calendar
+from ..reservations.availability import availability_index
+from ..reservations.models import Reservation
+
+logger = logging.getLogger(__name__)
+
+
+def batch_size():
+    return getattr(settings, 'PROPERTY_PURGE_BATCH_SIZE', 500)
+
+
+def _delete_batches(queryset, fields=(), on_batch=None):
+    """
+    Delete the rows of queryset in descending primary key order, batch_size() rows per transaction.
+
+    Rows are removed with raw DELETEs: no instances are loaded, no signals
+    are sent and no cascades are collected, so callers delete dependents
+    first. Descending order removes replies before the comments they answer.
+    on_batch, if given, receives the (pk, *fields) tuples of each deleted batch.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('-pk').values_list('pk', *fields)[:batch_size()])
+            if not rows:
+                return deleted
+            queryset.model._base_manager.filter(pk__in=[row[0] for row in rows])._raw_delete(queryset.db)
+            if on_batch is not None:
+                on_batch(rows)
+        deleted += len(rows)
+
+
+def purge_property(property_id):
+    """
+    Delete a soft-deleted property with its comments, images and reservations, in bounded batches
+    """
+    property = Property.all_objects.filter(pk=property_id, is_deleted=True).first()
+    if property is None:
+        return None
+
+    def delete_files(rows):
+        names = []
+        for _, name, derivatives in rows:
+            names.extend(imaging.stored_file_names(name, derivatives))
+        imaging.schedule_file_deletion(names)
+
+    counts = {
+        'comments': _delete_batches(Comments.objects.filter(Q(property=property_id) | Q(reservation__property=property_id))),
+        'images': _delete_batches(PropertyImage.objects.filter(property=property_id),
+                                  fields=('image', 'derivatives'), on_batch=delete_files),
+        'reservations': _delete_batches(Reservation.objects.filter(property=property_id)),
+    }
+    with transaction.atomic():
+        Property.all_objects.filter(pk=property_id)._raw_delete(Property.all_objects.db)
+        fulltext.remove_property(property_id)
+        imaging.schedule_file_deletion(imaging.stored_file_names(property.thumbnail.name, property.thumbnail_derivatives))
+    # Raw deletes send no signals; searches already stopped matching at soft_delete()
+    availability_index.invalidate([property_id])
+    calendar.invalidate([property_id])
+    logger.info('Purged property %s: %s', property_id, counts)
+    return counts
+
+
+def schedule_purge(property_id):
+    tasks.submit(purge_property, property_id)
+
+
+def purge_deleted_properties():
+    """
+    Purge every soft-deleted property, e.g. those whose background purge was lost to a restart
+    """
+    results = {}
+    for property_id in Property.all_objects.filter(is_deleted=True).order_by('pk').values_list('pk', flat=True):
+        results[property_id] = purge_property(property_id)
+    return results
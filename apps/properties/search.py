@@ -0,0 +1,336 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+from . import fulltext, geo
+from .choices import AMENITY_BITS, PRICE_BUCKETS
+from .models import Property, amenities_to_mask, normalize_location
+from ..reservations.availability import availability_index
+from ..reservations.models import Reservation
+
+
+SORT_CHOICES = ('relevance', 'distance', 'rate_high2low', 'price_low2high', 'price_high2low')
+
+# Query parameters that shape the response (page, representation), never change the matches
+RESPONSE_PARAMS = ('limit', 'offset', 'pagination', 'cursor', 'count', 'fields', 'view')
+
+
+def _parse_date(value):
+    """
+    Parse an optional YYYY-MM-DD query parameter, raising ValueError on bad input
+    """
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Dates must be in YYYY-MM-DD format.')
+
+
+def _parse_int(query_params, name):
+    value = query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('%s must be an integer.' % name)
+
+
+def _parse_float(query_params, name, minimum, maximum):
+    value = query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError('%s must be a number.' % name)
+    if not minimum <= value <= maximum:
+        raise ValueError('%s must be between %s and %s.' % (name, minimum, maximum))
+    return value
+
+
+def _parse_bbox(value):
+    """
+    Parse bbox=min_lng,min_lat,max_lng,max_lat (GeoJSON order)
+    """
+    if not value:
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat.')
+    if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat.')
+    return [min_lng, min_lat, max_lng, max_lat]
+
+
+def parse_search_params(query_params):
+    """
+    Normalize the search query string into a dict, raising ValueError on malformed input.
+
+    Equivalent queries (different amenity order, letter case, single date
+    given as start or end) produce the same dict, so it doubles as a cache key.
+    """
+    start_date = _parse_date(query_params.get('start_date'))
+    end_date = _parse_date(query_params.get('end_date'))
+    if start_date or end_date:
+        # A single date searches for a one-night stay
+        start_date = start_date or end_date
+        end_date = end_date or start_date
+        if start_date > end_date:
+            raise ValueError('start_date must not be after end_date.')
+
+    latitude = _parse_float(query_params, 'lat', -90, 90)
+    longitude = _parse_float(query_params, 'lng', -180, 180)
+    radius_km = _parse_float(query_params, 'radius_km', 0, 20000)
+    if (latitude is None) != (longitude is None):
+        raise ValueError('lat and lng must be given together.')
+    if radius_km is not None and latitude is None:
+        raise ValueError('radius_km requires lat and lng.')
+
+    # Normalized to its words so that punctuation and case differences share a cache entry
+    keywords = ' '.join(fulltext.tokenize(query_params.get('q')))
+    sort_by = query_params.get('sort_by')
+    if (sort_by not in SORT_CHOICES or (sort_by == 'relevance' and not keywords)
+            or (sort_by == 'distance' and latitude is None)):
+        sort_by = 'relevance' if keywords else 'rate_high2low'
+    params = {
+        'q': keywords or None,
+        'lat': latitude,
+        'lng': longitude,
+        'radius_km': radius_km,
+        'bbox': _parse_bbox(query_params.get('bbox')),
+        'province': normalize_location(query_params.get('province')) or None,
+        'city': normalize_location(query_params.get('city')) or None,
+        'price_min': _parse_int(query_params, 'price_min'),
+        'price_max': _parse_int(query_params, 'price_max'),
+        'amenities': sorted(set(query_params.getlist('amenities'))),
+        'start_date': start_date,
+        'end_date': end_date,
+        'sort_by': sort_by,
+    }
+    for name in RESPONSE_PARAMS:
+        params[name] = query_params.get(name)
+    return params
+
+
+def exclude_unavailable(queryset, start_date, end_date):
+    """
+    Drop properties with an active reservation overlapping [start_date, end_date]
+    """
+    if availability_index.enabled:
+        # Small candidate sets are answered from the in-process availability index
+        limit = availability_index.search_limit
+        candidate_ids = list(queryset.values_list('property_id', flat=True)[:limit + 1])
+        if len(candidate_ids) <= limit:
+            free_ids = availability_index.free_property_ids(candidate_ids, start_date, end_date)
+            return queryset.filter(property_id__in=free_ids)
+    # Correlated NOT EXISTS: only reservations of the candidate property are probed
+    conflicting_reservations = Reservation.objects.filter(
+        property=OuterRef('pk'),
+        status__in=Reservation.ACTIVE_STATUSES,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    )
+    return queryset.filter(~Exists(conflicting_reservations))
+
+
+def filter_properties(params):
+    """
+    Unordered queryset of the properties matching the parsed search params
+    """
+    property_queryset = Property.objects.all()
+
+    if params['q']:
+        property_queryset = fulltext.search(property_queryset, params['q'])
+    if params['province']:
+        property_queryset = property_queryset.filter(province_normalized=params['province'])
+    if params['city']:
+        property_queryset = property_queryset.filter(city_normalized=params['city'])
+    if params['price_min'] is not None:
+        property_queryset = property_queryset.filter(price__gte=params['price_min'])
+    if params['price_max'] is not None:
+        property_queryset = property_queryset.filter(price__lte=params['price_max'])
+    if params['amenities']:
+        if not set(params['amenities']) <= AMENITY_BITS.keys():
+            property_queryset = property_queryset.none()
+        # Properties having all requested amenities: mask & wanted == wanted
+        wanted = amenities_to_mask(params['amenities'])
+        property_queryset = property_queryset.alias(
+            matched_amenities=F('amenities_mask').bitand(wanted)
+        ).filter(matched_amenities=wanted)
+    if params['lat'] is not None:
+        property_queryset = geo.within_radius(property_queryset, params['lat'], params['lng'], params['radius_km'])
+    if params['bbox']:
+        property_queryset = geo.within_bbox(property_queryset, *params['bbox'])
+    if params['start_date']:
+        property_queryset = exclude_unavailable(property_queryset, params['start_date'], params['end_date'])
+    return property_queryset
+
+
+def order_properties(queryset, params):
+    """
+    Return the queryset annotated for the requested sort and its (field, descending) ordering.
+
+    The trailing property_id makes the order total, which keyset pagination relies on.
+    """
+    if params['sort_by'] == 'relevance':
+        return queryset, [('search_rank', True), ('property_id', True)]
+    if params['sort_by'] == 'distance':
+        return queryset, [('distance_km', False), ('property_id', False)]
+    if params['sort_by'] == 'price_low2high':
+        return queryset, [('price', False), ('property_id', False)]
+    if params['sort_by'] == 'price_high2low':
+        return queryset, [('price', True), ('property_id', True)]
+    queryset = queryset.annotate(
+        rating_or_zero=ExpressionWrapper(
+            Coalesce('rating', 0),
+            output_field=FloatField()
+        )
+    )
+    return queryset, [('rating_or_zero', True), ('property_id', True)]
+
+
+def price_bucket_label(low, high):
+    return '%d+' % low if high is None else '%d-%d' % (low, high)
+
+
+def compute_facets(queryset):
+    """
+    Facet counts over a filtered property queryset, in two grouped aggregate queries
+    """
+    queryset = queryset.order_by()
+    facets = {'province': {}, 'property_type': {}, 'num_bedrooms': {}}
+    total = 0
+    # One GROUP BY over the categorical columns, rolled up per column below
+    groups = queryset.values_list('province', 'property_type', 'num_bedrooms').annotate(count=Count('pk'))
+    for province, property_type, num_bedrooms, count in groups:
+        total += count
+        for name, value in (('province', province), ('property_type', property_type), ('num_bedrooms', num_bedrooms)):
+            facets[name][value] = facets[name].get(value, 0) + count
+
+    aggregates = {}
+    for amenity, bit in AMENITY_BITS.items():
+        aggregates['amenity:' + amenity] = Count('pk', filter=GreaterThan(F('amenities_mask').bitand(bit), 0))
+    for low, high in PRICE_BUCKETS:
+        condition = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+        aggregates['price:' + price_bucket_label(low, high)] = Count('pk', filter=condition)
+    counts = queryset.aggregate(**aggregates)
+    facets['amenities'] = {amenity: counts['amenity:' + amenity] for amenity in AMENITY_BITS}
+    facets['price'] = {price_bucket_label(low, high): counts['price:' + price_bucket_label(low, high)]
+                       for low, high in PRICE_BUCKETS}
+    facets['num_bedrooms'] = dict(sorted(facets['num_bedrooms'].items()))
+    return {'count': total, 'facets': facets}
+
+
+class SearchCache:
+    """
+    Cache of rendered search responses in the Django cache framework.
+
+    Entries are keyed on the normalized params plus a generation token for
+    the narrowest location the search filters on (city, else province, else
+    everything). Writes to a property or its reservations replace the tokens
+    of its city, its province and the global scope, orphaning every entry
+    that could include it; orphans age out through the cache's TTL/LRU culling.
+    The tokens are only seen by every process when the cache alias is shared
+    (see CACHES); with a per-process backend other workers serve stale pages
+    until SEARCH_CACHE_TIMEOUT.
+
+    The hit/miss counters are kept per process.
+    """
+    prefix = 'search'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'SEARCH_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'SEARCH_CACHE_TIMEOUT', 60)
+
+    @property
+    def enabled(self):
+        return self.timeout > 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _generation_key(self, scope, value=None):
+        if value is None:
+            return '%s:gen:%s' % (self.prefix, scope)
+        return '%s:gen:%s:%s' % (self.prefix, scope, hashlib.sha1(value.encode('utf-8')).hexdigest())
+
+    def _scope(self, params):
+        if params.get('city'):
+            return self._generation_key('city', params['city'])
+        if params.get('province'):
+            return self._generation_key('province', params['province'])
+        return self._generation_key('all')
+
+    def make_key(self, namespace, params, base_url=''):
+        scope = self._scope(params)
+        generation = self.cache.get(scope)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            # Another process may have set it first; use whichever token won
+            if not self.cache.add(scope, generation, timeout=None):
+                generation = self.cache.get(scope, generation)
+        digest = hashlib.sha1(json.dumps([base_url, params], cls=DjangoJSONEncoder, sort_keys=True)
+                              .encode('utf-8')).hexdigest()
+        return '%s:%s:%s:%s' % (self.prefix, namespace, generation, digest)
+
+    def get(self, key):
+        payload = self.cache.get(key)
+        self._count('misses' if payload is None else 'hits')
+        return payload
+
+    def set(self, key, payload):
+        self.cache.set(key, payload, timeout=self.timeout)
+
+    def invalidate(self, locations):
+        """
+        Orphan the cached searches that may include properties at the given (province, city) pairs
+        """
+        keys = {self._generation_key('all')}
+        for province, city in locations:
+            if province:
+                keys.add(self._generation_key('province', normalize_location(province)))
+            if city:
+                keys.add(self._generation_key('city', normalize_location(city)))
+        self.cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        self._count('invalidations')
+
+    def invalidate_on_commit(self, locations):
+        locations = list(locations)
+        transaction.on_commit(lambda: self.invalidate(locations))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else None
+        counters['timeout'] = self.timeout
+        # Counters cover the lookups of this worker only
+        counters['scope'] = 'process'
+        counters['pid'] = os.getpid()
+        return counters
+
+
+search_cache = SearchCache()
@@ -1,22 +1,44 @@
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
+from restify.media import MediaImageField, absolute_media_url
+
+from . import imaging
 from .choices import AMENITY_CHOICES
 from .models import Property, PropertyImage
 
-class PropertySerializer(ModelSerializer):
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin taking a fields= keyword that limits the serialized fields
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PropertySerializer(SparseFieldsMixin, ModelSerializer):
     """
     Serializer for Property model
     """
 
     amenities = serializers.MultipleChoiceField(choices=AMENITY_CHOICES, required=False)
-    thumbnail = serializers.ImageField()
+    thumbnail = MediaImageField()
+    thumbnail_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Property
-        fields = '__all__'
+        exclude = ('amenities_mask', 'geohash', 'city_normalized', 'province_normalized', 'thumbnail_derivatives',
+                   'is_deleted', 'deleted_at')
         read_only_fields = ('owner', 'rating')
 
+    def get_thumbnail_srcset(self, obj):
+        return imaging.srcset(obj.thumbnail_derivatives, obj.thumbnail.name, self.context.get('request'))
+
     # def to_representation(self, instance):
     #     representation = super().to_representation(instance)
     #     representation['owner'] = instance.owner.id
@@ -39,12 +61,17 @@ class PropertySerializer(ModelSerializer):
 
 class PropertyImageSerializer(ModelSerializer):
 
-    image = serializers.ImageField(required=True)
+    image = MediaImageField(required=True)
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = PropertyImage
-        fields = '__all__'
+        exclude = ('derivatives', 'updated_at')
         read_only_fields = ('property', )
 
+    def get_srcset(self, obj):
+        return imaging.srcset(obj.derivatives, obj.image.name, self.context.get('request'))
+
 
     def get_image(self, obj):
         request = self.context.get('request')
@@ -54,7 +81,101 @@ class PropertyImageSerializer(ModelSerializer):
             else:
                 return obj.avatar.url
         return None
-        
 
 
+class PropertyCardSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for property cards in listings.
+
+    Builds each row directly instead of going through one Field per column;
+    values are formatted the same way PropertySerializer formats them.
+    """
+    FIELD_NAMES = ('property_id', 'title', 'city', 'province', 'price', 'property_type',
+                   'num_bedrooms', 'amenities', 'thumbnail', 'thumbnail_srcset', 'rating')
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        self.field_names = self.FIELD_NAMES if fields is None else tuple(name for name in self.FIELD_NAMES if name in fields)
+
+    def to_representation(self, instance):
+        row = {}
+        for name in self.field_names:
+            if name == 'thumbnail':
+                row[name] = self.thumbnail_url(instance)
+            elif name == 'thumbnail_srcset':
+                row[name] = imaging.srcset(instance.thumbnail_derivatives, instance.thumbnail.name,
+                                           self.context.get('request'))
+            elif name == 'rating':
+                row[name] = None if instance.rating is None else str(instance.rating)
+            elif name == 'amenities':
+                row[name] = list(instance.amenities or ())
+            else:
+                row[name] = getattr(instance, name)
+        return row
+
+    def thumbnail_url(self, instance):
+        if not instance.thumbnail:
+            return None
+        return absolute_media_url(instance.thumbnail.name, self.context.get('request'))
+
+
+class HostDashboardSerializer(PropertyCardSerializer):
+    """
+    Property card plus the statistics annotated by dashboard.host_dashboard()
+    """
+    STAT_NAMES = ('pending_reservations', 'approved_reservations', 'completed_reservations',
+                  'upcoming_check_ins', 'next_check_in', 'comment_count', 'average_rating')
+
+    def to_representation(self, instance):
+        row = super().to_representation(instance)
+        stats = {name: getattr(instance, name) for name in self.STAT_NAMES}
+        if stats['average_rating'] is not None:
+            stats['average_rating'] = round(float(stats['average_rating']), 2)
+        if stats['next_check_in'] is not None:
+            stats['next_check_in'] = stats['next_check_in'].isoformat()
+        row['stats'] = stats
+        return row
+
+
+def select_listing_serializer(query_params):
+    """
+    Pick the serializer class and field subset for a property listing from ?view= and ?fields=.
+
+    Raises ValueError naming any unknown field.
+    """
+    if query_params.get('view') == 'card':
+        serializer_class, available = PropertyCardSerializer, PropertyCardSerializer.FIELD_NAMES
+    else:
+        serializer_class, available = PropertySerializer, tuple(PropertySerializer().fields)
+    fields = query_params.get('fields')
+    if not fields:
+        return serializer_class, None
+    fields = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError('Unknown fields: %s.' % ', '.join(unknown))
+    return serializer_class, fields
+
+
+# Serialized fields computed from columns other than their own
+LISTING_FIELD_COLUMNS = {
+    'thumbnail_srcset': ('thumbnail', 'thumbnail_derivatives'),
+}
+
+
+def listing_columns(serializer_class, fields, extra=()):
+    """
+    Model columns to load with only() for a listing serialized with the given fields
+    """
+    if fields is None:
+        fields = serializer_class.FIELD_NAMES if issubclass(serializer_class, PropertyCardSerializer) else None
+    if fields is None:
+        return None
+    fields = set(fields) | set(extra)
+    for name, columns in LISTING_FIELD_COLUMNS.items():
+        if name in fields:
+            fields.update(columns)
+    concrete = {field.name for field in Property._meta.concrete_fields}
+    return sorted({'property_id'} | (concrete & fields))
 
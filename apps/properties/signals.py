@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import fulltext, imaging
+from .models import Property, PropertyImage
+from .search import search_cache
+from ..reservations.models import Reservation
+
+
+@receiver(pre_save, sender=Property)
+def remember_property_state(sender, instance, **kwargs):
+    # A property moving to another city must invalidate the searches of both,
+    # and a new thumbnail needs new derivatives
+    instance._previous_location = None
+    instance._previous_thumbnail = None
+    if instance.pk is not None:
+        previous = Property.all_objects.filter(pk=instance.pk).values_list('province', 'city', 'thumbnail').first()
+        if previous is not None:
+            instance._previous_location = previous[:2]
+            instance._previous_thumbnail = previous[2]
+
+
+@receiver(post_save, sender=Property)
+def invalidate_search_on_property_save(sender, instance, **kwargs):
+    locations = [(instance.province, instance.city)]
+    if getattr(instance, '_previous_location', None):
+        locations.append(instance._previous_location)
+    search_cache.invalidate_on_commit(locations)
+
+
+@receiver(post_delete, sender=Property)
+def invalidate_search_on_property_delete(sender, instance, **kwargs):
+    search_cache.invalidate_on_commit([(instance.province, instance.city)])
+
+
+@receiver(post_save, sender=Property)
+def sync_fulltext_on_property_save(sender, instance, **kwargs):
+    fulltext.sync_property(instance)
+
+
+@receiver(post_delete, sender=Property)
+def sync_fulltext_on_property_delete(sender, instance, **kwargs):
+    fulltext.remove_property(instance.pk)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_search_on_reservation_change(sender, instance, **kwargs):
+    # Only date-filtered searches depend on reservations, but they share the location scopes
+    locations = Property.objects.filter(pk=instance.property_id).values_list('province', 'city')
+    search_cache.invalidate_on_commit(locations)
+
+
+@receiver(post_save, sender=Property)
+def derive_thumbnail_on_property_save(sender, instance, **kwargs):
+    if imaging.has_source(instance.thumbnail) and instance.thumbnail.name != getattr(instance, '_previous_thumbnail', None):
+        imaging.schedule_thumbnail_derivatives(instance.pk)
+
+
+@receiver(post_save, sender=PropertyImage)
+def derive_image_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'image' in update_fields:
+        if imaging.has_source(instance.image) and instance.derivatives.get('source') != instance.image.name:
+            imaging.schedule_image_derivatives(instance.pk)
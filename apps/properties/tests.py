@@ -1,3 +1,155 @@
+import io
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from . import imaging, uploads, views
+from .models import Property, PropertyImage
+from .search import filter_properties, order_properties, parse_search_params
 
 # Create your tests here.
+
+
+class PropertyLocationIndexTest(TestCase):
+    """
+    The common "city + price range + sort by rating" search must be answered by an index range scan
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='host@example.com', password='password',
+                                         first_name='Host', last_name='User')
+        for index, city in enumerate(['Toronto', ' toronto ', 'Ottawa', 'Montreal']):
+            Property.objects.create(owner=owner, title='Property %d' % index, address='%d Main St' % index,
+                                    city=city, province='ON', postal_code='M5V', price=100 + index * 50,
+                                    property_type='condo', num_bedrooms=2, sqft=700)
+
+    def search(self, query_string):
+        params = parse_search_params(QueryDict(query_string))
+        return order_properties(filter_properties(params), params)[0]
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # With a handful of rows a sequential scan is always cheapest; ask for the indexed plan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_normalized_columns_maintained_on_save(self):
+        property = Property.objects.get(title='Property 1')
+        self.assertEqual(property.city_normalized, 'toronto')
+        self.assertEqual(property.province_normalized, 'on')
+
+        property.city = 'North  York'
+        property.save(update_fields=['city'])
+        property.refresh_from_db()
+        self.assertEqual(property.city_normalized, 'north york')
+
+    def test_city_filter_is_case_and_space_insensitive(self):
+        titles = set(self.search('city=TORONTO&province=on').values_list('title', flat=True))
+        self.assertEqual(titles, {'Property 0', 'Property 1'})
+
+    def test_city_price_rating_search_uses_composite_index(self):
+        plan = self.explain(self.search('city=Toronto&price_min=120&price_max=400&sort_by=rate_high2low'))
+        self.assertIn('property_city_price_idx', plan, plan)
+
+    def test_province_price_search_uses_composite_index(self):
+        plan = self.explain(self.search('province=ON&price_min=120&sort_by=price_low2high'))
+        self.assertIn('property_province_price_idx', plan, plan)
+
+
+class FakeSigningCredentials:
+    """
+    Stands in for google.auth.credentials.Signing, e.g. service account key credentials
+    """
+
+
+class GCSSignedUploadURLTest(TestCase):
+    """
+    Signed upload URLs must work with keyless default credentials (Cloud Run, Compute Engine)
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='host@example.com', password='password',
+                                              first_name='Host', last_name='User')
+        self.property = Property.objects.create(owner=self.owner, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def request_upload(self, credentials):
+        storage = mock.Mock()
+        storage.client._credentials = credentials
+        blob = storage.bucket.blob.return_value
+        blob.generate_signed_url.return_value = 'https://storage.googleapis.com/bucket/signed'
+        with mock.patch.object(uploads, 'uses_gcs', return_value=True), \
+                mock.patch.object(uploads, 'default_storage', storage), \
+                mock.patch.object(uploads, 'Signing', FakeSigningCredentials, create=True), \
+                mock.patch.object(uploads, 'AuthRequest', mock.Mock(), create=True):
+            response = self.client.post('/api/properties/image-upload-url/%d' % self.property.property_id,
+                                        {'content_type': 'image/png'}, format='json')
+        return response, blob.generate_signed_url
+
+    def test_compute_engine_credentials_sign_through_iam(self):
+        credentials = mock.Mock(valid=False, token=None, service_account_email='default')
+
+        def refresh(request):
+            credentials.valid = True
+            credentials.token = 'access-token'
+            credentials.service_account_email = 'app@project.iam.gserviceaccount.com'
+        credentials.refresh.side_effect = refresh
+
+        response, generate_signed_url = self.request_upload(credentials)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['url'], 'https://storage.googleapis.com/bucket/signed')
+        kwargs = generate_signed_url.call_args.kwargs
+        self.assertEqual(kwargs['service_account_email'], 'app@project.iam.gserviceaccount.com')
+        self.assertEqual(kwargs['access_token'], 'access-token')
+        self.assertEqual((kwargs['version'], kwargs['method'], kwargs['content_type']), ('v4', 'PUT', 'image/png'))
+
+    def test_service_account_key_signs_locally(self):
+        response, generate_signed_url = self.request_upload(FakeSigningCredentials())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertNotIn('access_token', generate_signed_url.call_args.kwargs)
+
+
+class PropertyImageBatchCreateTest(TestCase):
+    """
+    Derivatives are scheduled with real ids even where bulk_create cannot return the inserted rows
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='host@example.com', password='password',
+                                              first_name='Host', last_name='User')
+        self.property = Property.objects.create(owner=self.owner, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def image_file(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_ids_without_returning_rows(self):
+        storage = mock.Mock()
+        storage.save.side_effect = lambda name, file: name
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(views, 'default_storage', storage), \
+                mock.patch.object(imaging, 'schedule_image_derivatives') as schedule:
+            response = self.client.post('/api/properties/image-batch-create/%d' % self.property.property_id,
+                                        {'images': [self.image_file('a.png'), self.image_file('b.png')]},
+                                        format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        ids = set(PropertyImage.objects.filter(property=self.property).values_list('pk', flat=True))
+        self.assertEqual(len(ids), 2)
+        self.assertEqual({call.args[0] for call in schedule.call_args_list}, ids)
+        self.assertEqual({result['image']['id'] for result in response.json()['results']}, ids)
@@ -0,0 +1,133 @@
+import datetime
+import posixpath
+import re
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+try:
+    from google.auth.credentials import Signing
+    from google.auth.transport.requests import Request as AuthRequest
+    from storages.backends.gcloud import GoogleCloudStorage
+except (ImportError, ImproperlyConfigured):  # google-cloud-storage is not installed
+    GoogleCloudStorage = None
+
+
+UPLOAD_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+UPLOAD_PREFIX = 'property_images/uploads'
+SIGNING_SALT = 'apps.properties.uploads'
+
+_key_pattern = re.compile(r'^[a-z0-9_/]+\.(jpg|png|webp)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+def upload_ttl():
+    return getattr(settings, 'SIGNED_UPLOAD_TTL', 900)
+
+
+def upload_max_bytes():
+    return getattr(settings, 'SIGNED_UPLOAD_MAX_BYTES', settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+
+def uses_gcs():
+    return GoogleCloudStorage is not None and isinstance(default_storage, GoogleCloudStorage)
+
+
+def key_prefix(property_id):
+    return '%s/%d/' % (UPLOAD_PREFIX, property_id)
+
+
+def new_upload_key(property_id, content_type):
+    return key_prefix(property_id) + uuid.uuid4().hex + UPLOAD_CONTENT_TYPES[content_type]
+
+
+def signing_arguments(credentials):
+    """
+    Extra generate_signed_url arguments for the storage client's credentials.
+
+    Service account keys sign URLs with their private key. The default
+    credentials on Cloud Run and Compute Engine have none, so they are
+    refreshed for an access token and the IAM signBlob API signs on behalf
+    of their service account, which needs the Service Account Token Creator
+    role on itself.
+    """
+    if isinstance(credentials, Signing):
+        return {}
+    # Until the first refresh the metadata server credentials only know their email as 'default'
+    if not credentials.valid or getattr(credentials, 'service_account_email', 'default') == 'default':
+        credentials.refresh(AuthRequest())
+    return {'service_account_email': credentials.service_account_email, 'access_token': credentials.token}
+
+
+def create_upload(request, property_id, content_type):
+    """
+    Reserve an object key and return how to upload it: {key, url, method, headers, expires_in}.
+
+    On Google Cloud Storage the URL is a V4 signed PUT URL, so the bytes go
+    straight to the bucket. Other storages get a signed token for the local
+    PUT endpoint, which stands in for the bucket offline.
+    """
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        raise UploadError('content_type must be one of %s.' % ', '.join(sorted(UPLOAD_CONTENT_TYPES)))
+    key = new_upload_key(property_id, content_type)
+    if uses_gcs():
+        blob = default_storage.bucket.blob(key)
+        # GS_CREDENTIALS when configured, else google.auth.default() as resolved by the client
+        credentials = default_storage.client._credentials
+        url = blob.generate_signed_url(version='v4', expiration=datetime.timedelta(seconds=upload_ttl()),
+                                       method='PUT', content_type=content_type,
+                                       **signing_arguments(credentials))
+    else:
+        token = signing.dumps({'key': key, 'content_type': content_type}, salt=SIGNING_SALT)
+        url = request.build_absolute_uri(reverse('properties:image_upload_put', args=[token]))
+    return {
+        'key': key,
+        'url': url,
+        'method': 'PUT',
+        'headers': {'Content-Type': content_type},
+        'expires_in': upload_ttl(),
+    }
+
+
+def read_upload_token(token):
+    """
+    The {key, content_type} a local upload token was issued for, raising UploadError when invalid or expired
+    """
+    try:
+        return signing.loads(token, salt=SIGNING_SALT, max_age=upload_ttl())
+    except signing.SignatureExpired:
+        raise UploadError('Upload URL has expired.')
+    except signing.BadSignature:
+        raise UploadError('Invalid upload URL.')
+
+
+def check_uploaded_object(property_id, key):
+    """
+    Validate a key handed back by the client after uploading, raising UploadError when it cannot be recorded
+    """
+    if not key or not key.startswith(key_prefix(property_id)) or not _key_pattern.match(key) \
+            or posixpath.normpath(key) != key:
+        raise UploadError('Invalid upload key.')
+    if not default_storage.exists(key):
+        raise UploadError('No uploaded object found for this key.')
+    if default_storage.size(key) > upload_max_bytes():
+        default_storage.delete(key)
+        raise UploadError('Uploaded image is too large.')
+    try:
+        with default_storage.open(key, 'rb') as uploaded:
+            Image.open(uploaded).verify()
+    except Exception:
+        default_storage.delete(key)
+        raise UploadError('Uploaded object is not a valid image.')
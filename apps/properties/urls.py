@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import PropertyCreateView, PropertyDetailsView, PropertyUDView, PropertyImageRView, PropertyImageCreateView, PropertySearchView, PropertyGetMyView, PropertyImageDeleteView
+from .views import PropertyBatchDetailsView, PropertyCreateView, PropertyDetailsView, PropertyUDView, PropertyImageRView, PropertyImageCreateView, PropertySearchView, PropertyGetMyView, PropertyHostDashboardView, PropertyImageBatchCreateView, PropertyImageBulkDeleteView, PropertyImageDeleteView, PropertyImageUploadConfirmView, PropertyImageUploadURLView, SignedUploadPutView, PropertySearchCacheStatsView, PropertySearchFacetsView
 
 app_name = "properties"
 
@@ -8,10 +8,19 @@ urlpatterns = [
     path('create', PropertyCreateView.as_view(), name='create_property'),
     path('modify/<int:property_id>', PropertyUDView.as_view(), name='modify'),
     path('search/', PropertySearchView.as_view(), name='search'),
+    path('search/facets', PropertySearchFacetsView.as_view(), name='search_facets'),
+    path('search/cache-stats', PropertySearchCacheStatsView.as_view(), name='search_cache_stats'),
+    path('details', PropertyBatchDetailsView.as_view(), name='batch_details'),
     path('details/<int:property_id>', PropertyDetailsView.as_view(), name='details'),
     path('image-create/<int:property_id>', PropertyImageCreateView.as_view(), name='image_create'),
+    path('image-batch-create/<int:property_id>', PropertyImageBatchCreateView.as_view(), name='image_batch_create'),
+    path('image-upload-url/<int:property_id>', PropertyImageUploadURLView.as_view(), name='image_upload_url'),
+    path('image-upload-confirm/<int:property_id>', PropertyImageUploadConfirmView.as_view(), name='image_upload_confirm'),
+    path('upload/<str:token>', SignedUploadPutView.as_view(), name='image_upload_put'),
     path('image-view/<int:property_id>', PropertyImageRView.as_view(), name='image_view'),
     path('image-delete/<int:image_id>', PropertyImageDeleteView.as_view(), name='image_delete'),
-    path('my', PropertyGetMyView.as_view(), name='get_my')
+    path('image-bulk-delete', PropertyImageBulkDeleteView.as_view(), name='image_bulk_delete'),
+    path('my', PropertyGetMyView.as_view(), name='get_my'),
+    path('dashboard', PropertyHostDashboardView.as_view(), name='host_dashboard')
 ]
 
@@ -1,22 +1,29 @@
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from concurrent.futures import ThreadPoolExecutor
+
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.pagination import LimitOffsetPagination
 
 from rest_framework_simplejwt import authentication
 
-from django.db.models import Q, FloatField, ExpressionWrapper
-from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
 from django.shortcuts import get_object_or_404
 
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-import datetime
-
+from restify.pagination import paginate_ordered
+from restify.conditional import not_modified, queryset_validators, set_validators
+from restify.streaming import NDJSONStreamMixin, ndjson_response, stream_requested
+from . import imaging, uploads
+from .dashboard import DASHBOARD_ORDERING, host_dashboard
 from .models import Property, PropertyImage
-from ..reservations.models import Reservation
-from .serializers import PropertySerializer, PropertyImageSerializer
+from .search import RESPONSE_PARAMS, compute_facets, filter_properties, order_properties, parse_search_params, search_cache
+from .serializers import HostDashboardSerializer, PropertySerializer, PropertyImageSerializer, listing_columns, select_listing_serializer
 
 # Create your views here.
 
@@ -33,15 +40,68 @@ class PropertyDetailsView(APIView):
                                              type=openapi.TYPE_STRING)],
         responses={
             '404': 'Property Not Found',
+            '304': 'Not Modified',
             '200': PropertySerializer
         }
     )
     def get(self, request, property_id):
         queryset = Property.objects.filter(property_id=property_id)
         property = get_object_or_404(queryset)
+        validators = queryset_validators(request, queryset, 'last_modified')
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
         serializer = PropertySerializer(instance=property, many=False)
 
-        return Response(serializer.data, status=200)
+        return set_validators(Response(serializer.data, status=200), validators)
+
+
+class PropertyBatchDetailsView(APIView):
+    permission_classes = (AllowAny,)
+    max_ids = 50
+
+    @swagger_auto_schema(
+        operation_summary="Get details of several properties",
+        operation_description="Get the details and images of up to 50 properties in one request. "
+                              "Results follow the order of ids; ids that do not exist are reported "
+                              "per item instead of failing the request.",
+        security=[],
+        manual_parameters=[openapi.Parameter('ids',
+                                             openapi.IN_QUERY,
+                                             description="Comma-separated property IDs, e.g. 1,2,3.",
+                                             type=openapi.TYPE_STRING,
+                                             required=True)],
+        responses={
+            '400': 'Missing, malformed or too many ids',
+            '200': 'List of {property_id, property, images} or {property_id, detail}'
+        }
+    )
+    def get(self, request):
+        try:
+            ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({'detail': 'ids must be a comma-separated list of integers.'}, status=400)
+        if not ids:
+            return Response({'detail': 'ids is required.'}, status=400)
+        if len(ids) > self.max_ids:
+            return Response({'detail': 'At most %d ids can be requested at once.' % self.max_ids}, status=400)
+
+        property_queryset = Property.objects.filter(property_id__in=set(ids)).prefetch_related('propertyimage_set')
+        properties = {property.property_id: property for property in property_queryset}
+        results = []
+        for property_id in ids:
+            property = properties.get(property_id)
+            if property is None:
+                results.append({'property_id': property_id, 'detail': 'Property not found.'})
+                continue
+            # Same representations as details/<property_id> and image-view/<property_id>
+            results.append({
+                'property_id': property_id,
+                'property': PropertySerializer(instance=property).data,
+                'images': PropertyImageSerializer(instance=property.propertyimage_set.all(), many=True,
+                                                  context={'request': request}).data,
+            })
+        return Response({'results': results}, status=200)
 
 
 class PropertyCreateView(APIView):
@@ -100,6 +160,188 @@ class PropertyImageCreateView(APIView):
         return Response(serializer.errors, status=400)
 
 
+class PropertyImageBatchCreateView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser, )
+    pk_url_kwarg = 'property_id'
+
+    @swagger_auto_schema(
+        operation_summary="Upload several property images",
+        operation_description="Upload up to IMAGE_BATCH_MAX_FILES images to the given property_id in one "
+                              "multipart request. Every file is validated first; valid files are stored in "
+                              "parallel and the result of each file is reported in upload order.",
+        manual_parameters=[openapi.Parameter('images',
+                                             openapi.IN_FORM,
+                                             description="Image files; repeat the field for each file.",
+                                             type=openapi.TYPE_FILE,
+                                             required=True),
+                           openapi.Parameter('image_names',
+                                             openapi.IN_FORM,
+                                             description="Optional names, one per file in the same order. "
+                                                         "Defaults to the file name.",
+                                             type=openapi.TYPE_STRING)],
+        responses={
+            '400': 'No file could be uploaded',
+            '401': 'Unauthorized',
+            '403': 'Forbidden',
+            '404': 'Property Not Found',
+            '201': 'Per-file results',
+        }
+    )
+    def post(self, request, property_id):
+        property = get_object_or_404(Property.objects.filter(property_id=property_id))
+        if property.owner != request.user:
+            return Response('Forbidden', status=403)
+        files = request.FILES.getlist('images')
+        names = request.data.getlist('image_names')
+        if not files:
+            return Response({'images': ['No files were submitted.']}, status=400)
+        max_files = getattr(settings, 'IMAGE_BATCH_MAX_FILES', 30)
+        if len(files) > max_files:
+            return Response({'images': ['At most %d files can be uploaded at once.' % max_files]}, status=400)
+
+        results, pending = [], []
+        for index, file in enumerate(files):
+            image_name = (names[index] if index < len(names) and names[index] else file.name)[:150]
+            result = {'index': index, 'file': file.name}
+            results.append(result)
+            serializer = PropertyImageSerializer(data={'image': file, 'image_name': image_name})
+            if not serializer.is_valid():
+                result['errors'] = serializer.errors
+                continue
+            image = PropertyImage(property=property, image_name=image_name)
+            pending.append((result, image, image.image.field.generate_filename(image, file.name), file))
+
+        def store(item):
+            _, _, name, file = item
+            return default_storage.save(name, file)
+
+        stored = []
+        with ThreadPoolExecutor(max_workers=getattr(settings, 'IMAGE_UPLOAD_WORKERS', 4)) as executor:
+            futures = [executor.submit(store, item) for item in pending]
+            for (result, image, _, _), future in zip(pending, futures):
+                try:
+                    image.image.name = future.result()
+                except Exception:
+                    result['errors'] = ['Could not store the file.']
+                    continue
+                stored.append((result, image))
+
+        if stored:
+            try:
+                PropertyImage.objects.bulk_create([image for _, image in stored])
+            except Exception:
+                for _, image in stored:
+                    default_storage.delete(image.image.name)
+                raise
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # Without RETURNING the created rows have no pk; their stored names are unique
+                ids = dict(PropertyImage.objects.filter(property=property,
+                                                        image__in=[image.image.name for _, image in stored])
+                           .values_list('image', 'pk'))
+                for _, image in stored:
+                    image.pk = ids[image.image.name]
+            for result, image in stored:
+                result['image'] = PropertyImageSerializer(instance=image, context={'request': request}).data
+                # bulk_create does not send post_save
+                imaging.schedule_image_derivatives(image.pk)
+        return Response({'results': results}, status=201 if stored else 400)
+
+
+class PropertyImageUploadURLView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    pk_url_kwarg = 'property_id'
+
+    @swagger_auto_schema(
+        operation_summary="Request an image upload URL",
+        operation_description="Step 1 of a direct upload: returns a short-lived signed URL. PUT the image bytes "
+                              "to it with the returned headers, then confirm with image-upload-confirm.",
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, required=['content_type'], properties={
+            'content_type': openapi.Schema(type=openapi.TYPE_STRING, enum=sorted(uploads.UPLOAD_CONTENT_TYPES)),
+        }),
+        responses={
+            '400': 'Unsupported content type',
+            '401': 'Unauthorized',
+            '403': 'Forbidden',
+            '404': 'Property Not Found',
+            '201': '{key, url, method, headers, expires_in}',
+        }
+    )
+    def post(self, request, property_id):
+        property = get_object_or_404(Property.objects.filter(property_id=property_id))
+        if property.owner != request.user:
+            return Response('Forbidden', status=403)
+        try:
+            upload = uploads.create_upload(request, property.property_id, request.data.get('content_type'))
+        except uploads.UploadError as error:
+            return Response({'detail': str(error)}, status=400)
+        return Response(upload, status=201)
+
+
+class SignedUploadPutView(APIView):
+    """
+    Local stand-in for a signed storage URL, used when files are not stored on Google Cloud Storage
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    @swagger_auto_schema(auto_schema=None)
+    def put(self, request, token):
+        try:
+            upload = uploads.read_upload_token(token)
+        except uploads.UploadError as error:
+            return Response({'detail': str(error)}, status=403)
+        if request.content_type.split(';')[0].strip() != upload['content_type']:
+            return Response({'detail': 'Content-Type does not match the upload URL.'}, status=400)
+        if int(request.META.get('CONTENT_LENGTH') or 0) > uploads.upload_max_bytes():
+            return Response({'detail': 'Uploaded image is too large.'}, status=413)
+        if default_storage.exists(upload['key']):
+            return Response({'detail': 'Upload URL has already been used.'}, status=409)
+        default_storage.save(upload['key'], ContentFile(request.body))
+        return Response(status=200)
+
+
+class PropertyImageUploadConfirmView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    pk_url_kwarg = 'property_id'
+
+    @swagger_auto_schema(
+        operation_summary="Confirm a direct image upload",
+        operation_description="Step 2 of a direct upload: record the uploaded object as an image of the property.",
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, required=['key', 'image_name'], properties={
+            'key': openapi.Schema(type=openapi.TYPE_STRING),
+            'image_name': openapi.Schema(type=openapi.TYPE_STRING),
+        }),
+        responses={
+            '400': 'Invalid key, missing object or not an image',
+            '401': 'Unauthorized',
+            '403': 'Forbidden',
+            '404': 'Property Not Found',
+            '201': PropertyImageSerializer,
+        }
+    )
+    def post(self, request, property_id):
+        property = get_object_or_404(Property.objects.filter(property_id=property_id))
+        if property.owner != request.user:
+            return Response('Forbidden', status=403)
+        key = request.data.get('key')
+        image_name = request.data.get('image_name')
+        if not image_name:
+            return Response({'image_name': ['This field is required.']}, status=400)
+        try:
+            uploads.check_uploaded_object(property.property_id, key)
+        except uploads.UploadError as error:
+            return Response({'detail': str(error)}, status=400)
+        if PropertyImage.objects.filter(image=key).exists():
+            return Response({'detail': 'This upload has already been confirmed.'}, status=400)
+        image = PropertyImage.objects.create(property=property, image=key, image_name=image_name[:150])
+        serializer = PropertyImageSerializer(instance=image, context={'request': request})
+        return Response(serializer.data, status=201)
+
+
 class PropertyImageRView(APIView):
     permission_classes = (AllowAny,)
     pk_url_kwarg = 'property_id'
@@ -114,6 +356,7 @@ class PropertyImageRView(APIView):
                                              type=openapi.TYPE_STRING)],
         responses={
             '404': 'Property Not Found',
+            '304': 'Not Modified',
             '200': PropertyImageSerializer
         }
     )
@@ -121,9 +364,13 @@ class PropertyImageRView(APIView):
         property_queryset = Property.objects.filter(property_id=property_id)
         property = get_object_or_404(property_queryset)
         image_queryset = PropertyImage.objects.filter(property_id=property.property_id)
+        validators = queryset_validators(request, image_queryset, 'updated_at', last_modified=False)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
         serializer = PropertyImageSerializer(instance=image_queryset, many=True, context={'request': request})
 
-        return Response(serializer.data, status=200)
+        return set_validators(Response(serializer.data, status=200), validators)
 
 
 class PropertyImageDeleteView(APIView):
@@ -132,19 +379,55 @@ class PropertyImageDeleteView(APIView):
     pk_url_kwarg = ('image_id')
 
     def delete(self, request, image_id):
-        image_queryset = PropertyImage.objects.filter(id=image_id)
-        image = get_object_or_404(image_queryset)
-        property_id = image.property_id
-        user_id = request.user
-        property_queryset = Property.objects.filter(owner=user_id)
-        property_list = []
-        for i in property_queryset:
-            property_list.append(i.owner)
-        if user_id in property_list:
-            image.delete()
-            return Response("Delete successful", status=200)
-        else:
+        image = PropertyImage.objects.filter(id=image_id, property__owner=request.user).first()
+        if image is None:
+            get_object_or_404(PropertyImage.objects.filter(id=image_id))
             return Response("Forbidden", status=403)
+        image.delete()
+        imaging.schedule_file_deletion(imaging.stored_file_names(image.image.name, image.derivatives))
+        return Response("Delete successful", status=200)
+
+
+class PropertyImageBulkDeleteView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    max_ids = 100
+
+    @swagger_auto_schema(
+        operation_summary="Delete several property images",
+        operation_description="Delete up to 100 images of the current user's properties in one transaction. "
+                              "Either every image is deleted or none is; stored files are removed in the background.",
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, required=['ids'], properties={
+            'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+        }),
+        responses={
+            '400': 'Missing, malformed or too many ids',
+            '401': 'Unauthorized',
+            '404': 'Some images do not exist or belong to another user',
+            '200': '{deleted: count}',
+        }
+    )
+    def post(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(value, int) for value in ids):
+            return Response({'detail': 'ids must be a non-empty list of integers.'}, status=400)
+        if len(ids) > self.max_ids:
+            return Response({'detail': 'At most %d images can be deleted at once.' % self.max_ids}, status=400)
+        ids = set(ids)
+        with transaction.atomic():
+            images = list(PropertyImage.objects.select_for_update(of=('self', ))
+                          .filter(id__in=ids, property__owner=request.user)
+                          .values_list('id', 'image', 'derivatives'))
+            missing = sorted(ids - {image_id for image_id, _, _ in images})
+            if missing:
+                # Images of other users are reported the same as missing ones
+                return Response({'detail': 'Images not found.', 'ids': missing}, status=404)
+            PropertyImage.objects.filter(id__in=ids).delete()
+            names = []
+            for _, name, derivatives in images:
+                names.extend(imaging.stored_file_names(name, derivatives))
+            imaging.schedule_file_deletion(names)
+        return Response({'deleted': len(images)}, status=200)
 
 
 class PropertyUDView(APIView):
@@ -200,7 +483,8 @@ class PropertyUDView(APIView):
         property = get_object_or_404(property_queryset)
         if property.owner != owner:
             return Response('Unauthorized', status=403)
-        property.delete()
+        # Hidden at once; reservations, comments and images are purged in the background
+        property.soft_delete()
         return Response('Deletion Successful', status=200)
 
 
@@ -212,7 +496,28 @@ class PropertySearchView(APIView):
         operation_summary="Search properties",
         operation_description="Search properties that matched the given parameters and return a list",
         security=[],
-        manual_parameters=[openapi.Parameter('province',
+        manual_parameters=[openapi.Parameter('q',
+                                             openapi.IN_QUERY,
+                                             description="Keywords matched against title, address and city. "
+                                                         "Results are ranked by relevance unless sort_by is given.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('lat',
+                                             openapi.IN_QUERY,
+                                             description="Latitude of the search centre; requires lng.",
+                                             type=openapi.TYPE_NUMBER),
+                           openapi.Parameter('lng',
+                                             openapi.IN_QUERY,
+                                             description="Longitude of the search centre; requires lat.",
+                                             type=openapi.TYPE_NUMBER),
+                           openapi.Parameter('radius_km',
+                                             openapi.IN_QUERY,
+                                             description="Only properties within this distance of lat/lng.",
+                                             type=openapi.TYPE_NUMBER),
+                           openapi.Parameter('bbox',
+                                             openapi.IN_QUERY,
+                                             description="Bounding box as min_lng,min_lat,max_lng,max_lat.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('province',
                                              openapi.IN_QUERY,
                                              type=openapi.TYPE_STRING),
                            openapi.Parameter('city',
@@ -233,6 +538,32 @@ class PropertySearchView(APIView):
                            openapi.Parameter('end_date',
                                              openapi.IN_QUERY,
                                              type=openapi.TYPE_STRING),
+                           openapi.Parameter('sort_by',
+                                             openapi.IN_QUERY,
+                                             type=openapi.TYPE_STRING,
+                                             enum=['relevance', 'distance', 'rate_high2low', 'price_low2high', 'price_high2low']),
+                           openapi.Parameter('pagination',
+                                             openapi.IN_QUERY,
+                                             description="Set to 'cursor' for keyset pagination; "
+                                                         "then follow the next/previous links.",
+                                             type=openapi.TYPE_STRING,
+                                             enum=['cursor']),
+                           openapi.Parameter('cursor',
+                                             openapi.IN_QUERY,
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('count',
+                                             openapi.IN_QUERY,
+                                             description="In cursor mode, also return the total count.",
+                                             type=openapi.TYPE_BOOLEAN),
+                           openapi.Parameter('fields',
+                                             openapi.IN_QUERY,
+                                             description="Comma-separated fields to return.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('view',
+                                             openapi.IN_QUERY,
+                                             description="'card' for the compact listing representation.",
+                                             type=openapi.TYPE_STRING,
+                                             enum=['card']),
                            ],
         responses={
             '403': 'Unauthorized',
@@ -241,84 +572,180 @@ class PropertySearchView(APIView):
         }
     )
     def get(self, request, *args, **kwargs):
-        province = request.GET.get('province', None)
-        city = request.GET.get('city', None)
-        price_min = request.GET.get('price_min', None)
-        price_max = request.GET.get('price_max', None)
-        amenities = request.GET.getlist('amenities', [])
-        start_date = request.GET.get('start_date', None)
-        end_date = request.GET.get('end_date', None)
-        sort_by = request.GET.get('sort_by', None)
-
-        start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
-        end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
-
-        reserved_properties_queryset = Reservation.objects.filter((Q(status='Approved') | Q(status='Pending')))
-        conflict_properties = []
-        for obj in reserved_properties_queryset:
-            print(obj.start_date)
-            print(start_date)
-            print(obj.end_date)
-            print(end_date)
-
-            if not ((start_date < obj.start_date and end_date < obj.start_date)
-                    or (start_date > obj.end_date and end_date > obj.end_date)):
-                conflict_properties.append(obj.property_id)
-
-        property_queryset = Property.objects.exclude(property_id__in=conflict_properties)
-
-        if province:
-            property_queryset = property_queryset.filter(province__iexact=province)
-        if city:
-            property_queryset = property_queryset.filter(city__iexact=city)
-        if price_min:
-            property_queryset = property_queryset.filter(price__gte=price_min)
-        if price_max:
-            property_queryset = property_queryset.filter(price__lte=price_max)
-        if amenities:
-            for amenity in amenities:
-                property_queryset = property_queryset.filter(amenities__icontains=amenity)
-
-        if sort_by == 'price_low2high':
-            property_queryset = property_queryset.order_by('price')
-        elif sort_by == 'price_high2low':
-            property_queryset = property_queryset.order_by('-price')
-        elif sort_by == 'rate_high2low':
-            property_queryset = property_queryset.annotate(
-                rating_or_zero=ExpressionWrapper(
-                    Coalesce('rating', 0),
-                    output_field=FloatField()
-                )
-            ).order_by('-rating_or_zero')
-        else:
-            property_queryset = property_queryset.annotate(
-                rating_or_zero=ExpressionWrapper(
-                    Coalesce('rating', 0),
-                    output_field=FloatField()
-                )
-            ).order_by('-rating_or_zero')
-
-        paginator = LimitOffsetPagination()
-        paginated_queryset = paginator.paginate_queryset(property_queryset, request)
-        serializer = PropertySerializer(paginated_queryset, many=True, context={'request': request})
-        return Response({
-            'count': paginator.count,
+        try:
+            params = parse_search_params(request.GET)
+            serializer_class, fields = select_listing_serializer(request.GET)
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=400)
+
+        cache_key = None
+        if search_cache.enabled:
+            # Pagination links are absolute, so the host is part of the key
+            cache_key = search_cache.make_key('results', params, request.build_absolute_uri(request.path))
+            payload = search_cache.get(cache_key)
+            if payload is not None:
+                return Response(payload, status=200)
+
+        property_queryset, ordering = order_properties(filter_properties(params), params)
+        # Keyset cursors read the ordering columns from each row, so they are always loaded
+        columns = listing_columns(serializer_class, fields, extra=[field for field, _ in ordering])
+        if columns:
+            property_queryset = property_queryset.only(*columns)
+
+        paginator, paginated_queryset, count = paginate_ordered(request, property_queryset, ordering)
+        serializer = serializer_class(paginated_queryset, many=True, fields=fields, context={'request': request})
+        payload = {
+            'count': count,
             'next': paginator.get_next_link(),
             'previous': paginator.get_previous_link(),
-            'results': serializer.data}, status=200
-        )
+            'results': serializer.data
+        }
+        if cache_key:
+            search_cache.set(cache_key, payload)
+        return Response(payload, status=200)
+
+
+class PropertySearchFacetsView(APIView):
+    permission_classes = (AllowAny, )
+
+    @swagger_auto_schema(
+        operation_summary="Search facet counts",
+        operation_description="Count the properties matching the search filters per province, property type, "
+                              "bedroom count, amenity and price bucket. Takes the same filters as search; "
+                              "sorting and pagination parameters are ignored.",
+        security=[],
+        responses={
+            '400': 'Bad Request',
+            '200': 'Facet counts'
+        }
+    )
+    def get(self, request):
+        try:
+            params = parse_search_params(request.GET)
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=400)
+        # Sorting, paging and field selection do not change the counts, so they must not split the cache
+        for name in RESPONSE_PARAMS + ('sort_by', ):
+            params.pop(name)
+
+        cache_key = None
+        if search_cache.enabled:
+            cache_key = search_cache.make_key('facets', params)
+            payload = search_cache.get(cache_key)
+            if payload is not None:
+                return Response(payload, status=200)
+
+        payload = compute_facets(filter_properties(params))
+        if cache_key:
+            search_cache.set(cache_key, payload)
+        return Response(payload, status=200)
+
+
+class PropertySearchCacheStatsView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @swagger_auto_schema(
+        operation_summary="Search cache statistics",
+        operation_description="Hit/miss/invalidation counters of the search result cache, counted by the "
+                              "worker process that answers (scope and pid in the response), not across "
+                              "workers. The cached pages themselves live in the shared cache.",
+        responses={
+            '200': 'Counters',
+            '403': 'Forbidden'
+        }
+    )
+    def get(self, request):
+        return Response(search_cache.stats(), status=200)
 
-class PropertyGetMyView(APIView):
+class PropertyGetMyView(NDJSONStreamMixin, APIView):
     authentication_classes = (authentication.JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
+    @swagger_auto_schema(
+        operation_summary="Get my properties",
+        operation_description="List the properties owned by the current user.",
+        manual_parameters=[openapi.Parameter('fields',
+                                             openapi.IN_QUERY,
+                                             description="Comma-separated fields to return.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('view',
+                                             openapi.IN_QUERY,
+                                             description="'card' for the compact listing representation.",
+                                             type=openapi.TYPE_STRING,
+                                             enum=['card']),
+                           openapi.Parameter('stream',
+                                             openapi.IN_QUERY,
+                                             description="Stream the listing as NDJSON, one property per line. "
+                                                         "Also selected by Accept: application/x-ndjson.",
+                                             type=openapi.TYPE_BOOLEAN)],
+        responses={
+            '400': 'Unknown fields',
+            '401': 'Unauthorized',
+            '200': PropertySerializer
+        }
+    )
     def get(self, request):
         owner = request.user
+        try:
+            serializer_class, fields = select_listing_serializer(request.GET)
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=400)
         property_queryset = Property.objects.filter(owner=owner)
-        serializer = PropertySerializer(instance=property_queryset, many=True, context={'request': request})
+        columns = listing_columns(serializer_class, fields)
+        if columns:
+            property_queryset = property_queryset.only(*columns)
+        if stream_requested(request):
+            serializer = serializer_class(fields=fields, context={'request': request})
+            return ndjson_response(property_queryset.order_by('property_id'), serializer)
+        serializer = serializer_class(instance=property_queryset, many=True, fields=fields, context={'request': request})
         return Response(serializer.data, status=200)
 
 
 
 
 
+
+
+class PropertyHostDashboardView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(
+        operation_summary="Host dashboard",
+        operation_description="Page through the current user's properties, newest first, each with its "
+                              "pending/approved/completed reservation counts, upcoming check-ins, comment "
+                              "count and average rating.",
+        manual_parameters=[openapi.Parameter('limit',
+                                             openapi.IN_QUERY,
+                                             type=openapi.TYPE_INTEGER),
+                           openapi.Parameter('offset',
+                                             openapi.IN_QUERY,
+                                             type=openapi.TYPE_INTEGER),
+                           openapi.Parameter('pagination',
+                                             openapi.IN_QUERY,
+                                             description="'cursor' for keyset pagination.",
+                                             type=openapi.TYPE_STRING,
+                                             enum=['cursor']),
+                           openapi.Parameter('cursor',
+                                             openapi.IN_QUERY,
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('count',
+                                             openapi.IN_QUERY,
+                                             description="In cursor mode, also return the total count.",
+                                             type=openapi.TYPE_BOOLEAN)],
+        responses={
+            '401': 'Unauthorized',
+            '200': HostDashboardSerializer
+        }
+    )
+    def get(self, request):
+        property_queryset = host_dashboard(request.user).only(*listing_columns(HostDashboardSerializer, None))
+        paginator, rows, count = paginate_ordered(request, property_queryset, DASHBOARD_ORDERING)
+        serializer = HostDashboardSerializer(rows, many=True, context={'request': request})
+        return Response({
+            'count': count,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': serializer.data
+        }, status=200)
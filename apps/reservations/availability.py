@@ -0,0 +1,281 @@
+import bisect
+import datetime
+import threading
+import time
+import uuid
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Reservation
+
+
+def merge_ranges(ranges):
+    """
+    Merge inclusive (start, end) date ranges sorted by start date.
+
+    Overlapping and back-to-back ranges (the next one starting the day after
+    the previous one ends) collapse into one; the result is sorted and disjoint.
+    """
+    merged = []
+    for start_date, end_date in ranges:
+        if merged and start_date <= merged[-1][1] + datetime.timedelta(days=1):
+            if end_date > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end_date)
+        else:
+            merged.append((start_date, end_date))
+    return merged
+
+
+def first_conflicts(blocked, ranges):
+    """
+    For each (start, end) in ranges, the range of blocked overlapping it, or None.
+
+    blocked must be sorted and disjoint, as returned by merge_ranges. Ranges
+    are visited by start date so one pass over blocked answers all of them.
+    """
+    conflicts = [None] * len(ranges)
+    position = 0
+    for index in sorted(range(len(ranges)), key=lambda index: ranges[index][0]):
+        start_date, end_date = ranges[index]
+        # Blocked ranges ending before this start also end before every later one
+        while position < len(blocked) and blocked[position][1] < start_date:
+            position += 1
+        if position < len(blocked) and blocked[position][0] <= end_date:
+            conflicts[index] = blocked[position]
+    return conflicts
+
+
+def blocked_ranges_by_property(property_ids, start_date, end_date):
+    """
+    {property_id: merged ranges of active stays overlapping [start_date, end_date]}, from one ordered query
+    """
+    stays = Reservation.objects.filter(
+        property_id__in=property_ids,
+        status__in=Reservation.ACTIVE_STATUSES,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).order_by('property_id', 'start_date', 'end_date').values_list('property_id', 'start_date', 'end_date')
+    blocked = {property_id: [] for property_id in property_ids}
+    for property_id, rows in groupby(stays.iterator(), key=itemgetter(0)):
+        blocked[property_id] = merge_ranges(row[1:] for row in rows)
+    return blocked
+
+
+def quote_ranges(property_ids, ranges):
+    """
+    {property_id: [conflicting blocked range or None, per range of ranges]}
+
+    One query fetches the active stays of every property across the span of
+    all ranges; each property is then answered by a single sweep.
+    """
+    blocked = blocked_ranges_by_property(property_ids,
+                                         min(start_date for start_date, _ in ranges),
+                                         max(end_date for _, end_date in ranges))
+    return {property_id: first_conflicts(spans, ranges) for property_id, spans in blocked.items()}
+
+
+class IntervalSet:
+    """
+    Sorted set of inclusive date intervals for one property.
+
+    Intervals are kept ordered by start date with a running maximum of the
+    end dates, so an overlap probe is one bisect plus one lookup.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def _rebuild(self):
+        self._starts = [interval[0] for interval in self._intervals]
+        # _reach[i] is the interval with the latest end date among the first i + 1
+        self._reach = []
+        latest = None
+        for interval in self._intervals:
+            if latest is None or interval[1] > latest[1]:
+                latest = interval
+            self._reach.append(latest)
+
+    def add(self, start_date, end_date, reservation_id):
+        bisect.insort(self._intervals, (start_date, end_date, reservation_id))
+        self._rebuild()
+
+    def discard(self, reservation_id):
+        intervals = [interval for interval in self._intervals if interval[2] != reservation_id]
+        if len(intervals) != len(self._intervals):
+            self._intervals = intervals
+            self._rebuild()
+
+    def conflict(self, start_date, end_date):
+        """
+        Return the (start, end, reservation_id) overlapping [start_date, end_date], or None
+        """
+        count = bisect.bisect_right(self._starts, end_date)
+        if count and self._reach[count - 1][1] >= start_date:
+            return self._reach[count - 1]
+        return None
+
+
+class AvailabilityIndex:
+    """
+    In-process index of the active (Approved/Pending) stays of each property.
+
+    Every property has a version token in the shared cache, replaced once a
+    write to its reservations commits, in whichever process made it. An entry
+    is only used while the token it was loaded under is current, so all
+    processes see a booking on their next read. The token is read before the
+    stays are queried, so a write the query missed replaces it afterwards and
+    the entry is never used. Entries are also dropped after
+    AVAILABILITY_INDEX_TTL seconds. Only stays that end on or after the day
+    an entry was loaded are held; probes reaching further into the past go
+    straight to the database. The index turns itself off when the tokens
+    live in a database cache, where reading them is no cheaper than asking
+    the database directly.
+    """
+    token_prefix = 'availability:version'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    @property
+    def enabled(self):
+        # With tokens in a database cache, checking them costs as much as the NOT EXISTS query it replaces
+        return getattr(settings, 'AVAILABILITY_INDEX_ENABLED', True) and not isinstance(self.cache, BaseDatabaseCache)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 300)
+
+    @property
+    def search_limit(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_SEARCH_LIMIT', 500)
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'AVAILABILITY_INDEX_CACHE_ALIAS', 'default')]
+
+    def _token_key(self, property_id):
+        return '%s:%s' % (self.token_prefix, property_id)
+
+    def _tokens(self, property_ids):
+        """
+        Current version token of each property, in at most two cache round trips
+        """
+        keys = {property_id: self._token_key(property_id) for property_id in property_ids}
+        found = self.cache.get_many(keys.values())
+        tokens, missing = {}, {}
+        for property_id, key in keys.items():
+            token = found.get(key)
+            if token is None:
+                token = missing[key] = uuid.uuid4().hex
+            tokens[property_id] = token
+        if missing:
+            # Overwriting a token another process set meanwhile only invalidates its entries,
+            # and ours are loaded after this write
+            self.cache.set_many(missing, timeout=None)
+        return tokens
+
+    def _warm(self, property_ids):
+        """
+        Return {property_id: IntervalSet} for the given ids, loading stale ones in one query
+        """
+        now = time.monotonic()
+        today = timezone.localdate()
+        # Read before querying: see the class docstring
+        tokens = self._tokens(property_ids)
+        found, cold = {}, []
+        with self._lock:
+            for property_id in property_ids:
+                entry = self._entries.get(property_id)
+                if entry and entry[1] == tokens[property_id] and now - entry[0] < self.ttl:
+                    found[property_id] = entry[2]
+                else:
+                    cold.append(property_id)
+        if not cold:
+            return found
+
+        rows = {property_id: [] for property_id in cold}
+        active_reservations = Reservation.objects.filter(
+            property_id__in=cold,
+            status__in=Reservation.ACTIVE_STATUSES,
+            end_date__gte=today,
+        ).values_list('property_id', 'start_date', 'end_date', 'id')
+        for property_id, start_date, end_date, reservation_id in active_reservations:
+            rows[property_id].append((start_date, end_date, reservation_id))
+
+        with self._lock:
+            for property_id, intervals in rows.items():
+                interval_set = IntervalSet(intervals)
+                found[property_id] = interval_set
+                # Each entry carries the token it was loaded under, so a concurrent
+                # load storing its snapshot after this one cannot hide a newer write
+                self._entries[property_id] = (now, tokens[property_id], interval_set)
+        return found
+
+    def _query_conflicts(self, property_ids, start_date, end_date, exclude_id=None):
+        queryset = Reservation.objects.filter(
+            property_id__in=property_ids,
+            status__in=Reservation.ACTIVE_STATUSES,
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+        )
+        if exclude_id is not None:
+            queryset = queryset.exclude(id=exclude_id)
+        return queryset
+
+    def is_free(self, property_id, start_date, end_date, exclude_id=None):
+        """
+        Whether [start_date, end_date] overlaps no active stay of the property
+        """
+        if not self.enabled or start_date < timezone.localdate():
+            return not self._query_conflicts([property_id], start_date, end_date, exclude_id).exists()
+        interval_set = self._warm([property_id])[property_id]
+        conflict = interval_set.conflict(start_date, end_date)
+        if conflict is not None and conflict[2] == exclude_id:
+            # The stay being modified may hide another overlap behind it
+            return not self._query_conflicts([property_id], start_date, end_date, exclude_id).exists()
+        return conflict is None
+
+    def free_property_ids(self, property_ids, start_date, end_date):
+        """
+        Return the subset of property_ids with no active stay overlapping [start_date, end_date]
+        """
+        property_ids = set(property_ids)
+        if not self.enabled or start_date < timezone.localdate():
+            blocked = self._query_conflicts(property_ids, start_date, end_date).values_list('property_id', flat=True)
+            return property_ids - set(blocked)
+        interval_sets = self._warm(property_ids)
+        return {property_id for property_id, interval_set in interval_sets.items()
+                if interval_set.conflict(start_date, end_date) is None}
+
+    def invalidate(self, property_ids=None):
+        """
+        Make every process reload the given entries; without ids, drop this process's whole index
+        """
+        with self._lock:
+            if property_ids is None:
+                self._entries.clear()
+                return
+            property_ids = list(property_ids)
+            for property_id in property_ids:
+                self._entries.pop(property_id, None)
+        self.cache.set_many({self._token_key(property_id): uuid.uuid4().hex for property_id in property_ids},
+                            timeout=None)
+
+    def invalidate_on_commit(self, property_ids):
+        # Replacing the tokens before commit would let another process reload the old rows under the new token
+        property_ids = list(property_ids)
+        transaction.on_commit(lambda: self.invalidate(property_ids))
+
+
+availability_index = AvailabilityIndex()
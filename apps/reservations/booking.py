@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+
+from .models import Reservation
+from ..properties.models import Property
+
+# Postgres exclusion constraint: no two active stays of a property may overlap
+OVERLAP_CONSTRAINT = 'reservation_no_overlap'
+
+
+class BookingConflict(Exception):
+    pass
+
+
+def create_constraint(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # Other backends rely on the property row lock taken by booking()
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    # '[]' matches the inclusive start_date__lte / end_date__gte overlap test used everywhere else
+    schema_editor.execute(
+        "ALTER TABLE reservations_reservation ADD CONSTRAINT %s EXCLUDE USING gist "
+        "(property_id WITH =, daterange(start_date, end_date, '[]') WITH &&) "
+        "WHERE (status IN (%s))"
+        % (OVERLAP_CONSTRAINT, ', '.join("'%s'" % status for status in Reservation.ACTIVE_STATUSES))
+    )
+
+
+def drop_constraint(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE reservations_reservation DROP CONSTRAINT IF EXISTS %s' % OVERLAP_CONSTRAINT)
+
+
+def lock_property(property_id):
+    """
+    Serialize the bookings of one property until the current transaction ends
+    """
+    if connection.features.has_select_for_update:
+        list(Property.all_objects.select_for_update().filter(pk=property_id).values_list('pk'))
+    else:
+        # SQLite has no row locks. Writing first takes the database write lock
+        # before anything is read, so concurrent bookings queue up here instead
+        # of failing to upgrade a read lock later.
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE properties_property SET property_id = property_id WHERE property_id = %s',
+                           [property_id])
+
+
+def has_conflict(property_id, start_date, end_date, exclude_id=None):
+    conflicting_reservations = Reservation.objects.filter(
+        property_id=property_id,
+        status__in=Reservation.ACTIVE_STATUSES,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    )
+    if exclude_id is not None:
+        conflicting_reservations = conflicting_reservations.exclude(pk=exclude_id)
+    return conflicting_reservations.exists()
+
+
+@contextmanager
+def booking(property_id, start_date, end_date, status, exclude_id=None):
+    """
+    Transaction in which a reservation for [start_date, end_date] may be saved, raising BookingConflict on overlap.
+
+    The property row is locked and the overlap checked against the
+    database, not the availability index, whose copy in another process may
+    lag. On Postgres the exclusion constraint backs this up; its violation
+    is reported as BookingConflict too.
+    """
+    try:
+        with transaction.atomic():
+            lock_property(property_id)
+            if status in Reservation.ACTIVE_STATUSES and has_conflict(property_id, start_date, end_date, exclude_id):
+                raise BookingConflict
+            yield
+    except IntegrityError as error:
+        if OVERLAP_CONSTRAINT in str(error):
+            raise BookingConflict from error
+        raise
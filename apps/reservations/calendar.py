@@ -0,0 +1,109 @@
+import datetime
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import blocked_ranges_by_property
+from .listing import parse_date
+
+
+CACHE_PREFIX = 'calendar'
+
+
+def _cache():
+    return caches[getattr(settings, 'CALENDAR_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 300)
+
+
+def max_days():
+    return getattr(settings, 'CALENDAR_MAX_DAYS', 731)
+
+
+def _version_key(property_id):
+    return '%s:version:%s' % (CACHE_PREFIX, property_id)
+
+
+def _version(property_id):
+    key = _version_key(property_id)
+    version = _cache().get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # Another process may have set it first; use whichever token won
+        if not _cache().add(key, version, timeout=None):
+            version = _cache().get(key, version)
+    return version
+
+
+def invalidate(property_ids):
+    """
+    Orphan the cached calendars of the given properties
+    """
+    _cache().set_many({_version_key(property_id): uuid.uuid4().hex for property_id in property_ids}, timeout=None)
+
+
+def invalidate_on_commit(property_ids):
+    property_ids = list(property_ids)
+    transaction.on_commit(lambda: invalidate(property_ids))
+
+
+def parse_window(query_params):
+    """
+    Return the (from, to) dates of a calendar request, raising ValueError on malformed input.
+
+    The window defaults to a year starting today and may span at most CALENDAR_MAX_DAYS days.
+    """
+    start_date = parse_date(query_params.get('from'), 'from') or timezone.localdate()
+    end_date = parse_date(query_params.get('to'), 'to') or start_date + datetime.timedelta(days=364)
+    if start_date > end_date:
+        raise ValueError('from must not be after to.')
+    if (end_date - start_date).days >= max_days():
+        raise ValueError('The window may span at most %d days.' % max_days())
+    return start_date, end_date
+
+
+def blocked_ranges(property_id, start_date, end_date):
+    """
+    Merged, sorted [start, end] ranges blocked by active stays within [start_date, end_date].
+
+    One query ordered by start date feeds the merge, so overlapping and
+    back-to-back stays collapse into a single range as the rows stream in.
+    """
+    blocked = blocked_ranges_by_property([property_id], start_date, end_date)[property_id]
+    return [(max(start, start_date), min(end, end_date)) for start, end in blocked]
+
+
+def property_calendar(property_id, start_date, end_date):
+    """
+    Return the calendar payload of a property over the window and its ETag.
+
+    Payloads are cached under the property's version token, which every
+    Reservation write replaces, and expire after CALENDAR_CACHE_TIMEOUT
+    seconds so writes seen only by another process's cache are picked up.
+    """
+    timeout = cache_timeout()
+    key = '%s:%s:%s:%s:%s' % (CACHE_PREFIX, property_id, _version(property_id),
+                              start_date.isoformat(), end_date.isoformat())
+    if timeout > 0:
+        cached = _cache().get(key)
+        if cached is not None:
+            return cached
+    payload = {
+        'property_id': property_id,
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'blocked': [{'start_date': start.isoformat(), 'end_date': end.isoformat()}
+                    for start, end in blocked_ranges(property_id, start_date, end_date)],
+    }
+    # The ETag hashes the payload itself, so it is right even when the cache was not
+    etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    if timeout > 0:
+        _cache().set(key, (payload, etag), timeout=timeout)
+    return payload, etag
@@ -0,0 +1,83 @@
+import datetime
+
+from .models import Reservation
+
+
+# Total order for paging reservation listings; id breaks ties between stays starting the same day
+RESERVATION_ORDERING = [('start_date', False), ('id', False)]
+
+# Query parameters that filter a reservation listing
+FILTER_PARAMS = ('status', 'from', 'to')
+
+# Query parameters that select a page of the listing
+PAGE_PARAMS = ('limit', 'offset', 'pagination', 'cursor')
+
+STATUS_VALUES = tuple(value for value, _ in Reservation.STATUS_CHOICES)
+
+
+def listing_requested(query_params):
+    """
+    Whether the client asked for a filtered or paged listing.
+
+    Without any of these parameters the listings keep their original shape:
+    every reservation as a bare list.
+    """
+    return any(name in query_params for name in FILTER_PARAMS + PAGE_PARAMS)
+
+
+def parse_date(value, name):
+    """
+    Parse an optional YYYY-MM-DD query parameter, raising ValueError on bad input
+    """
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('%s must be in YYYY-MM-DD format.' % name)
+
+
+def parse_range(value):
+    """
+    Parse an inclusive START/END date range (ISO 8601 interval, YYYY-MM-DD/YYYY-MM-DD)
+    """
+    start, separator, end = value.strip().partition('/')
+    start_date, end_date = parse_date(start, 'Range start'), parse_date(end, 'Range end')
+    if not separator or start_date is None or end_date is None:
+        raise ValueError('Ranges must be YYYY-MM-DD/YYYY-MM-DD.')
+    if start_date > end_date:
+        raise ValueError('Range %s starts after it ends.' % value.strip())
+    return start_date, end_date
+
+
+def parse_statuses(query_params):
+    """
+    Statuses from ?status=Approved,Pending or repeated ?status= parameters, raising ValueError on unknown ones
+    """
+    statuses = []
+    for value in query_params.getlist('status'):
+        statuses.extend(part.strip() for part in value.split(',') if part.strip())
+    unknown = [status for status in statuses if status not in STATUS_VALUES]
+    if unknown:
+        raise ValueError('Unknown status: %s. Choose from %s.' % (', '.join(unknown), ', '.join(STATUS_VALUES)))
+    return sorted(set(statuses))
+
+
+def filter_reservations(queryset, query_params):
+    """
+    Narrow a reservation queryset by ?status= and the ?from=/?to= window, raising ValueError on bad input.
+
+    The window keeps stays overlapping [from, to]; either end may be left open.
+    """
+    statuses = parse_statuses(query_params)
+    start_date = parse_date(query_params.get('from'), 'from')
+    end_date = parse_date(query_params.get('to'), 'to')
+    if start_date and end_date and start_date > end_date:
+        raise ValueError('from must not be after to.')
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if end_date:
+        queryset = queryset.filter(start_date__lte=end_date)
+    if start_date:
+        queryset = queryset.filter(end_date__gte=start_date)
+    return queryset
@@ -0,0 +1,116 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.properties.models import Property
+from apps.reservations.availability import availability_index
+from apps.reservations.models import Reservation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare availability checks against the database with the in-process availability index. " \
+           "Synthetic data is created inside a transaction that is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=2000)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--candidates', type=int, default=200,
+                            help="Number of property ids checked per search probe")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        availability_index.invalidate()
+
+    def seed(self, options):
+        rng = random.Random(0)
+        owner = User.objects.create(email='benchmark-availability@example.com', first_name='Bench', last_name='Mark')
+        Property.objects.bulk_create(
+            Property(owner=owner, title='Benchmark %d' % i, address='%d Main St' % i, city='Toronto',
+                     province='ON', postal_code='M5V', price=100, property_type='condo',
+                     num_bedrooms=2, sqft=700)
+            for i in range(options['properties'])
+        )
+        property_ids = list(Property.objects.filter(owner=owner).values_list('property_id', flat=True))
+        today = timezone.localdate()
+        reservations = []
+        for _ in range(options['reservations']):
+            start_date = today + datetime.timedelta(days=rng.randint(-365, 365))
+            reservations.append(Reservation(
+                tenant=owner, property_id=rng.choice(property_ids),
+                status=rng.choice(('Approved', 'Pending', 'Completed', 'Canceled')),
+                start_date=start_date, end_date=start_date + datetime.timedelta(days=rng.randint(1, 10)),
+            ))
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+        return rng, property_ids, today
+
+    def timed(self, label, probes, check):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for probe in probes:
+                check(*probe)
+            elapsed = time.perf_counter() - started
+        self.stdout.write("%-32s %8.2f ms total %8.3f ms/probe %8.1f queries/probe"
+                          % (label, elapsed * 1000, elapsed * 1000 / len(probes), len(queries) / len(probes)))
+
+    def run(self, options):
+        rng, property_ids, today = self.seed(options)
+        self.stdout.write("Seeded %d properties and %d reservations" % (len(property_ids), options['reservations']))
+        if not availability_index.enabled:
+            self.stdout.write("The index is disabled (AVAILABILITY_INDEX_ENABLED or a database token cache); "
+                              "index timings below fall back to the database")
+
+        ranges = []
+        for _ in range(options['queries']):
+            start_date = today + datetime.timedelta(days=rng.randint(0, 300))
+            ranges.append((start_date, start_date + datetime.timedelta(days=rng.randint(1, 14))))
+        booking_probes = [(rng.choice(property_ids), start_date, end_date) for start_date, end_date in ranges]
+        search_probes = [(rng.sample(property_ids, min(options['candidates'], len(property_ids))), start_date, end_date)
+                         for start_date, end_date in ranges]
+
+        def booking_db(property_id, start_date, end_date):
+            return not Reservation.objects.filter(
+                property_id=property_id, status__in=Reservation.ACTIVE_STATUSES,
+                start_date__lte=end_date, end_date__gte=start_date,
+            ).exists()
+
+        def search_db(candidate_ids, start_date, end_date):
+            conflicting_reservations = Reservation.objects.filter(
+                property=OuterRef('pk'), status__in=Reservation.ACTIVE_STATUSES,
+                start_date__lte=end_date, end_date__gte=start_date,
+            )
+            return set(Property.objects.filter(property_id__in=candidate_ids)
+                       .filter(~Exists(conflicting_reservations)).values_list('property_id', flat=True))
+
+        def search_index(candidate_ids, start_date, end_date):
+            return availability_index.free_property_ids(candidate_ids, start_date, end_date)
+
+        for probe in search_probes:
+            assert search_db(*probe) == search_index(*probe), "index and database disagree"
+
+        availability_index.invalidate()
+        self.timed("booking check (database)", booking_probes, booking_db)
+        self.timed("booking check (index, cold)", booking_probes[:1], availability_index.is_free)
+        availability_index.free_property_ids(property_ids, today, today)
+        self.timed("booking check (index, warm)", booking_probes, availability_index.is_free)
+        availability_index.invalidate()
+        self.timed("search filter (database)", search_probes, search_db)
+        availability_index.invalidate()
+        self.timed("search filter (index, cold)", search_probes[:1], search_index)
+        self.timed("search filter (index, warm)", search_probes, search_index)
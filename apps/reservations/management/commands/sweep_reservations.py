@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.reservations.sweeper import sweep
+
+
+class Command(BaseCommand):
+    help = "Complete Approved reservations that have ended and expire Pending ones whose start date " \
+           "has passed, in batches. Run it from a scheduler, or set RESERVATION_SWEEP_INTERVAL to " \
+           "sweep from a background thread of each server process."
+
+    def handle(self, *args, **options):
+        for name, result in sweep().items():
+            self.stdout.write("%s: %d updated in %d batches across %d properties (%.3fs)"
+                              % (name, result['updated'], result['batches'], result['properties'], result['seconds']))
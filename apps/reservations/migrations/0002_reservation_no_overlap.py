@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:20
+
+from django.db import migrations
+
+
+def create_overlap_constraint(apps, schema_editor):
+    from apps.reservations.booking import create_constraint
+
+    create_constraint(schema_editor)
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    from apps.reservations.booking import drop_constraint
+
+    drop_constraint(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0001_initial'),
+    ]
+
+    operations = [
+        # Postgres only: EXCLUDE USING gist over (property_id, daterange) for Pending/Approved stays.
+        # Existing overlapping active reservations must be resolved before this can be applied.
+        migrations.RunPython(create_overlap_constraint, drop_overlap_constraint),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_reservation_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['property', 'status', 'start_date'], name='reservation_prop_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['tenant', 'start_date'], name='reservation_tenant_start_idx'),
+        ),
+    ]
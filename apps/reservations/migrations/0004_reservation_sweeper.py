@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_reservation_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweeperState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transition', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateField(blank=True, null=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_updated', models.PositiveIntegerField(default=0)),
+                ('last_duration', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'end_date'], name='reservation_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'start_date'], name='reservation_status_start_idx'),
+        ),
+    ]
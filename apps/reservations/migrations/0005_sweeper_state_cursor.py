@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_reservation_sweeper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sweeperstate',
+            name='watermark_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -14,6 +14,8 @@ class Reservation(models.Model):
         ('Terminated', 'Terminated'),
         ('Completed', 'Completed')
     ]
+    # Statuses that block the booked dates for other tenants
+    ACTIVE_STATUSES = ('Approved', 'Pending')
 
     tenant = models.ForeignKey(User, on_delete=models.CASCADE)
     property = models.ForeignKey(Property, on_delete=models.CASCADE)
@@ -24,3 +26,30 @@ class Reservation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', 'status', 'start_date'], name='reservation_prop_status_idx'),
+            models.Index(fields=['tenant', 'start_date'], name='reservation_tenant_start_idx'),
+            # Status sweeps: Approved stays by end date, Pending requests by start date
+            models.Index(fields=['status', 'end_date'], name='reservation_status_end_idx'),
+            models.Index(fields=['status', 'start_date'], name='reservation_status_start_idx'),
+        ]
+
+
+class SweeperState(models.Model):
+    """
+    Progress of one status transition of the reservation sweeper (apps.reservations.sweeper)
+    """
+    transition = models.CharField(max_length=50, unique=True)
+    # (date, id) of the last row handled by the run in progress, so an interrupted run resumes
+    # after it; cleared when a run completes
+    watermark = models.DateField(null=True, blank=True)
+    watermark_id = models.BigIntegerField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_updated = models.PositiveIntegerField(default=0)
+    last_duration = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return self.transition
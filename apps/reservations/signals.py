@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import calendar
+from .availability import availability_index
+from .models import Reservation
+
+
+def _affected_property_ids(instance):
+    return {instance.property_id, getattr(instance, '_previous_property_id', None)} - {None}
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_reservation_property(sender, instance, **kwargs):
+    # A stay moved to another property also frees the dates on the old one
+    instance._previous_property_id = None
+    if instance.pk is not None:
+        instance._previous_property_id = (Reservation.objects.filter(pk=instance.pk)
+                                          .values_list('property_id', flat=True).first())
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_availability_index(sender, instance, **kwargs):
+    availability_index.invalidate_on_commit(_affected_property_ids(instance))
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_calendar(sender, instance, **kwargs):
+    calendar.invalidate_on_commit(_affected_property_ids(instance))
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import calendar
+from .availability import availability_index
+from .models import Reservation, SweeperState
+
+logger = logging.getLogger(__name__)
+
+Transition = namedtuple('Transition', ('name', 'from_status', 'to_status', 'date_field'))
+
+# Approved stays are done once they have ended; Pending requests lapse once the stay would have begun
+TRANSITIONS = (
+    Transition('approved-to-completed', 'Approved', 'Completed', 'end_date'),
+    Transition('pending-to-expired', 'Pending', 'Expired', 'start_date'),
+)
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def batch_size():
+    return getattr(settings, 'RESERVATION_SWEEP_BATCH_SIZE', 500)
+
+
+def sweep_interval():
+    return getattr(settings, 'RESERVATION_SWEEP_INTERVAL', 0)
+
+
+def _invalidate(property_ids):
+    from ..properties.models import Property
+    from ..properties.search import search_cache
+
+    availability_index.invalidate(property_ids)
+    calendar.invalidate(property_ids)
+    search_cache.invalidate(Property.all_objects.filter(pk__in=property_ids).values_list('province', 'city'))
+
+
+def _state(transition):
+    try:
+        state, _ = SweeperState.objects.get_or_create(transition=transition.name)
+    except IntegrityError:
+        # Another process (a worker's sweeper thread, the command) created it first
+        state = SweeperState.objects.get(transition=transition.name)
+    return state
+
+
+def _sweep_transition(transition, today):
+    """
+    Apply one transition to the rows dated before today, one bounded batch per transaction.
+
+    Rows are selected by status and date, so rows already transitioned never
+    match again and a stay approved long after it ended is still picked up.
+    The watermark is the keyset position within the run, saved after each
+    batch so an interrupted run resumes where it stopped.
+    """
+    state = _state(transition)
+    started = time.monotonic()
+    state.last_started_at = timezone.now()
+    date_field = transition.date_field
+    pending = Reservation.objects.filter(**{'status': transition.from_status, '%s__lt' % date_field: today})
+
+    updated, batches, property_ids = 0, 0, set()
+    while True:
+        batch = pending
+        if state.watermark_id is not None:
+            batch = batch.filter(Q(**{'%s__gt' % date_field: state.watermark})
+                                 | Q(**{date_field: state.watermark, 'id__gt': state.watermark_id}))
+        with transaction.atomic():
+            # Rows another transaction holds (a reservation being updated, or the same batch taken by
+            # a sweep in another process) are left for the next run
+            rows = list(batch.select_for_update(skip_locked=True)
+                        .order_by(date_field, 'id').values_list(date_field, 'id', 'property_id')[:batch_size()])
+            if not rows:
+                break
+            updated += Reservation.objects.filter(id__in=[row[1] for row in rows], status=transition.from_status) \
+                .update(status=transition.to_status, updated_at=timezone.now())
+            state.watermark, state.watermark_id = rows[-1][0], rows[-1][1]
+            state.save(update_fields=['watermark', 'watermark_id', 'last_started_at'])
+        batches += 1
+        property_ids.update(row[2] for row in rows)
+
+    state.watermark = state.watermark_id = None
+    state.last_finished_at = timezone.now()
+    state.last_updated = updated
+    state.last_duration = round(time.monotonic() - started, 3)
+    state.save()
+    if property_ids:
+        _invalidate(property_ids)
+    result = {'updated': updated, 'batches': batches, 'properties': len(property_ids),
+              'seconds': state.last_duration}
+    logger.info('Reservation sweep %s: %s', transition.name, result)
+    return result
+
+
+def sweep(today=None):
+    """
+    Run every status transition once and return {transition name: counts and timing}.
+
+    Bulk updates send no signals, so the availability index, calendars and
+    search cache of the affected properties are invalidated here.
+    """
+    today = today or timezone.localdate()
+    return {transition.name: _sweep_transition(transition, today) for transition in TRANSITIONS}
+
+
+def _run_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            sweep()
+        except Exception:
+            logger.exception('Reservation sweep failed')
+        finally:
+            connections.close_all()
+
+
+def start_background_sweeper():
+    """
+    Sweep every RESERVATION_SWEEP_INTERVAL seconds in a daemon thread of this process.
+
+    Called from the server's worker processes only (see gunicorn.conf.py), never
+    from management commands or tests, which must not sweep their database.
+    """
+    global _thread
+    interval = sweep_interval()
+    with _thread_lock:
+        if interval <= 0 or _thread is not None:
+            return None
+        _thread = threading.Thread(target=_run_forever, args=(interval,), name='reservation-sweeper', daemon=True)
+        _thread.start()
+        return _thread
@@ -1,3 +1,268 @@
-from django.test import TestCase
+import datetime
+import random
+import threading
+import unittest
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.comments.models import Comments
+from apps.properties.models import Property
+from .availability import AvailabilityIndex, availability_index
+from .models import Reservation
+from .sweeper import sweep
 
 # Create your tests here.
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """
+    Parallel bookings of the same property must never produce overlapping active stays
+    """
+    threads = 8
+    attempts_per_thread = 6
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Threads would share one in-memory database through the shared cache,
+            # whose table locks fail immediately instead of waiting
+            raise unittest.SkipTest('Needs a file-backed or server database for concurrent connections')
+
+    def setUp(self):
+        self.host = User.objects.create_user(email='host@example.com', password='password',
+                                             first_name='Host', last_name='User')
+        self.property = Property.objects.create(owner=self.host, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.tenants = [User.objects.create_user(email='tenant%d@example.com' % index, password='password',
+                                                 first_name='Tenant', last_name=str(index))
+                        for index in range(self.threads)]
+
+    def book_in_parallel(self, ranges_per_thread):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+        lock = threading.Lock()
+
+        def run(tenant, ranges):
+            client = APIClient()
+            client.force_authenticate(tenant)
+            try:
+                barrier.wait()
+                for start_date, end_date in ranges:
+                    response = client.post('/api/reservations/create/%d' % self.property.property_id, {
+                        'property': self.property.property_id,
+                        'status': 'Pending',
+                        'start_date': start_date.isoformat(),
+                        'end_date': end_date.isoformat(),
+                    }, format='json')
+                    with lock:
+                        statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=run, args=(tenant, ranges))
+                   for tenant, ranges in zip(self.tenants, ranges_per_thread)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return statuses
+
+    def assert_no_overlaps(self):
+        stays = list(Reservation.objects.filter(property=self.property, status__in=Reservation.ACTIVE_STATUSES)
+                     .order_by('start_date').values_list('start_date', 'end_date'))
+        for (_, previous_end), (start_date, _) in zip(stays, stays[1:]):
+            self.assertGreater(start_date, previous_end)
+        return stays
+
+    def test_same_dates_booked_once(self):
+        start_date = timezone.localdate() + datetime.timedelta(days=30)
+        end_date = start_date + datetime.timedelta(days=3)
+        statuses = self.book_in_parallel([[(start_date, end_date)]] * self.threads)
+        self.assertEqual(sorted(statuses), [200] + [400] * (self.threads - 1))
+        self.assertEqual(len(self.assert_no_overlaps()), 1)
+
+    def test_random_overlapping_dates(self):
+        rng = random.Random(0)
+        first_day = timezone.localdate() + datetime.timedelta(days=30)
+        ranges_per_thread = []
+        for _ in range(self.threads):
+            ranges = []
+            for _ in range(self.attempts_per_thread):
+                start_date = first_day + datetime.timedelta(days=rng.randint(0, 40))
+                ranges.append((start_date, start_date + datetime.timedelta(days=rng.randint(0, 5))))
+            ranges_per_thread.append(ranges)
+        statuses = self.book_in_parallel(ranges_per_thread)
+        self.assertEqual(set(statuses) - {200, 400}, set())
+        stays = self.assert_no_overlaps()
+        self.assertEqual(len(stays), statuses.count(200))
+
+
+class ReservationListingTest(TestCase):
+    """
+    Listings stay bare lists unless the client asks for filters or pages
+    """
+
+    def setUp(self):
+        self.tenant = User.objects.create_user(email='tenant@example.com', password='password',
+                                               first_name='Tenant', last_name='User')
+        self.property = Property.objects.create(owner=self.tenant, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.empty_property = Property.objects.create(owner=self.tenant, title='Cabin', address='2 Lake Rd',
+                                                      city='Muskoka', province='ON', postal_code='P1H',
+                                                      price=100, property_type='house', num_bedrooms=1, sqft=600)
+        first_day = datetime.date(2030, 1, 1)
+        for index, status in enumerate(['Approved', 'Pending', 'Denied'] * 10):
+            start_date = first_day + datetime.timedelta(days=3 * index)
+            Reservation.objects.create(tenant=self.tenant, property=self.property, status=status,
+                                       start_date=start_date, end_date=start_date + datetime.timedelta(days=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.tenant)
+
+    def test_unpaged_listings_are_lists(self):
+        response = self.client.get('/api/reservations/details/%d' % self.property.property_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 30)
+        response = self.client.get('/api/reservations/my')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 30)
+
+    def test_property_without_reservations_is_not_found(self):
+        response = self.client.get('/api/reservations/details/%d' % self.empty_property.property_id)
+        self.assertEqual(response.status_code, 404)
+
+    def test_filters_and_pages(self):
+        response = self.client.get('/api/reservations/details/%d' % self.property.property_id,
+                                   {'status': 'Approved,Pending', 'from': '2030-01-05', 'to': '2030-01-20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['start_date'] for row in response.json()['results']],
+                         ['2030-01-04', '2030-01-10', '2030-01-13', '2030-01-19'])
+        response = self.client.get('/api/reservations/my', {'limit': 5})
+        self.assertEqual(response.json()['count'], 30)
+        self.assertEqual(len(response.json()['results']), 5)
+        response = self.client.get('/api/reservations/details/%d' % self.empty_property.property_id, {'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(self.client.get('/api/reservations/my', {'status': 'Unknown'}).status_code, 400)
+
+    def test_cursor_pages_cover_every_reservation(self):
+        seen = []
+        url = '/api/reservations/details/%d?pagination=cursor&limit=7' % self.property.property_id
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+
+
+class SoftDeletedPropertyTest(TestCase):
+    """
+    A soft-deleted property disappears from every reservation and comment endpoint before it is purged
+    """
+
+    def setUp(self):
+        self.tenant = User.objects.create_user(email='tenant@example.com', password='password',
+                                               first_name='Tenant', last_name='User')
+        self.property = Property.objects.create(owner=self.tenant, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.reservation = Reservation.objects.create(tenant=self.tenant, property=self.property,
+                                                      status='Completed', start_date=datetime.date(2030, 1, 1),
+                                                      end_date=datetime.date(2030, 1, 3))
+        self.comment = Comments.objects.create(user=self.tenant, reservation=self.reservation,
+                                               property=self.property, content='Lovely', rating=5)
+        self.property.soft_delete()
+        self.client = APIClient()
+        self.client.force_authenticate(self.tenant)
+
+    def test_reservation_endpoints(self):
+        property_id = self.property.property_id
+        self.assertEqual(self.client.get('/api/reservations/my').json(), [])
+        self.assertEqual(self.client.get('/api/reservations/my', {'limit': 5}).json()['count'], 0)
+        self.assertEqual(self.client.delete('/api/reservations/UD/%d' % self.reservation.id).status_code, 404)
+        self.assertEqual(self.client.get('/api/reservations/calendar/%d' % property_id).status_code, 404)
+        response = self.client.get('/api/reservations/availability',
+                                   {'property_id': property_id, 'ranges': '2030-01-01/2030-01-02'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/reservations/availability',
+                                   {'ids': property_id, 'start_date': '2030-01-01', 'end_date': '2030-01-02'})
+        self.assertEqual(response.json()['results'], [{'property_id': property_id, 'detail': 'Property not found.'}])
+        self.assertTrue(Reservation.objects.filter(pk=self.reservation.pk).exists())
+
+    def test_comment_endpoints(self):
+        self.assertEqual(self.client.get('/api/comments/details/%d' % self.reservation.id).status_code, 404)
+        self.assertEqual(self.client.get('/api/comments/property/%d' % self.property.property_id).status_code, 404)
+        self.assertEqual(self.client.get('/api/comments/get/%d' % self.comment.id).status_code, 404)
+
+
+class AvailabilityIndexTest(TestCase):
+    """
+    Each process's index must notice bookings committed by other processes
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(email='host@example.com', password='password',
+                                             first_name='Host', last_name='User')
+        self.property = Property.objects.create(owner=self.host, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+        self.start_date = timezone.localdate() + datetime.timedelta(days=30)
+        self.end_date = self.start_date + datetime.timedelta(days=3)
+        availability_index.invalidate()
+
+    def test_booking_in_another_process_is_seen(self):
+        other_process = AvailabilityIndex()
+        self.assertTrue(availability_index.is_free(self.property.property_id, self.start_date, self.end_date))
+        with self.captureOnCommitCallbacks(execute=True):
+            # The write and its on-commit invalidation happen in the other process
+            Reservation.objects.bulk_create([Reservation(tenant=self.host, property=self.property, status='Approved',
+                                                         start_date=self.start_date, end_date=self.end_date)])
+            other_process.invalidate_on_commit([self.property.property_id])
+        self.assertFalse(availability_index.is_free(self.property.property_id, self.start_date, self.end_date))
+
+    def test_current_entries_are_reused(self):
+        availability_index.is_free(self.property.property_id, self.start_date, self.end_date)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(availability_index.free_property_ids([self.property.property_id],
+                                                                  self.start_date, self.end_date),
+                             {self.property.property_id})
+        # Only the token lookup may reach the database, when the cache lives there
+        self.assertFalse([query for query in queries if Reservation._meta.db_table in query['sql']])
+
+
+class ReservationSweeperTest(TestCase):
+    """
+    Every past Approved/Pending reservation is transitioned, however late it was written
+    """
+
+    def setUp(self):
+        self.tenant = User.objects.create_user(email='tenant@example.com', password='password',
+                                               first_name='Tenant', last_name='User')
+        self.property = Property.objects.create(owner=self.tenant, title='Cottage', address='1 Lake Rd',
+                                                city='Muskoka', province='ON', postal_code='P1H',
+                                                price=200, property_type='house', num_bedrooms=3, sqft=1200)
+
+    def reserve(self, status, start_date, end_date):
+        return Reservation.objects.create(tenant=self.tenant, property=self.property, status=status,
+                                          start_date=start_date, end_date=end_date)
+
+    def test_late_approved_stay_is_completed(self):
+        today = timezone.localdate()
+        pending = self.reserve('Pending', today - datetime.timedelta(days=3), today + datetime.timedelta(days=2))
+        sweep()
+        # Approved years after it ended, long after the first sweep
+        late = self.reserve('Approved', datetime.date(2020, 1, 1), datetime.date(2020, 1, 3))
+        with self.settings(RESERVATION_SWEEP_BATCH_SIZE=1):
+            results = sweep()
+        self.assertEqual(results['approved-to-completed']['updated'], 1)
+        late.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual((late.status, pending.status), ('Completed', 'Expired'))
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import ReservationsView, ReservationCreate, ReservationUD, ReservationGetMyView, ReservationAutoUpdateView
+from .views import ReservationsView, ReservationCreate, ReservationUD, ReservationGetMyView, ReservationAutoUpdateView, \
+    PropertyCalendarView, AvailabilityQuoteView
 
 app_name = 'reservations'
 urlpatterns = [
@@ -7,5 +8,7 @@ urlpatterns = [
     path('create/<int:property_id>', ReservationCreate.as_view(), name='reservation_create'),
     path('UD/<int:reservation_id>', ReservationUD.as_view(), name='reservation_UD'),
     path('my', ReservationGetMyView.as_view(), name='get_my_reservation'),
+    path('calendar/<int:property_id>', PropertyCalendarView.as_view(), name='property_calendar'),
+    path('availability', AvailabilityQuoteView.as_view(), name='availability_quote'),
     path('auto-update', ReservationAutoUpdateView.as_view(), name='auto-update'),
 ]
\ No newline at end of file
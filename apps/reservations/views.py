@@ -1,52 +1,126 @@
-from django.db.models import Q
 from rest_framework.response import Response
+from . import calendar
+from .booking import BookingConflict, booking
+from .availability import quote_ranges
+from .listing import RESERVATION_ORDERING, filter_reservations, listing_requested, parse_range
 from .models import Reservation
 from ..properties.models import Property
 from .serializers import ReservationSerializer
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from .sweeper import sweep
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework_simplejwt import authentication
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from datetime import datetime
+from restify.pagination import paginate_ordered
+from restify.conditional import Validators, not_modified, queryset_validators, set_validators
+from restify.streaming import NDJSONStreamMixin, ndjson_response, stream_requested
 
 
 # Create your views here.
 
-class ReservationsView(APIView):
+LISTING_PARAMETERS = [openapi.Parameter('status',
+                                        openapi.IN_QUERY,
+                                        description="Comma-separated statuses to keep, e.g. Approved,Pending.",
+                                        type=openapi.TYPE_STRING),
+                      openapi.Parameter('from',
+                                        openapi.IN_QUERY,
+                                        description="Keep stays ending on or after this day (YYYY-MM-DD).",
+                                        type=openapi.TYPE_STRING),
+                      openapi.Parameter('to',
+                                        openapi.IN_QUERY,
+                                        description="Keep stays starting on or before this day (YYYY-MM-DD).",
+                                        type=openapi.TYPE_STRING),
+                      openapi.Parameter('limit',
+                                        openapi.IN_QUERY,
+                                        type=openapi.TYPE_INTEGER),
+                      openapi.Parameter('offset',
+                                        openapi.IN_QUERY,
+                                        type=openapi.TYPE_INTEGER),
+                      openapi.Parameter('pagination',
+                                        openapi.IN_QUERY,
+                                        description="'cursor' for keyset pagination.",
+                                        type=openapi.TYPE_STRING,
+                                        enum=['cursor']),
+                      openapi.Parameter('cursor',
+                                        openapi.IN_QUERY,
+                                        type=openapi.TYPE_STRING),
+                      openapi.Parameter('count',
+                                        openapi.IN_QUERY,
+                                        description="In cursor mode, also return the total count.",
+                                        type=openapi.TYPE_BOOLEAN),
+                      openapi.Parameter('stream',
+                                        openapi.IN_QUERY,
+                                        description="Stream the listing as NDJSON, one reservation per line. "
+                                                    "Also selected by Accept: application/x-ndjson.",
+                                        type=openapi.TYPE_BOOLEAN)]
+
+
+def paginated_reservations(request, reservations):
+    """
+    One page of reservations ordered by start date, as count/next/previous/results
+    """
+    paginator, rows, count = paginate_ordered(request, reservations, RESERVATION_ORDERING)
+    serializer = ReservationSerializer(instance=rows, many=True, context={'request': request})
+    return {
+        'count': count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': serializer.data
+    }
+
+
+class ReservationsView(NDJSONStreamMixin, APIView):
     permission_classes = (AllowAny,)
     pk_url_kwarg = 'property_id'
 
     @swagger_auto_schema(
         operation_summary="Get all reservations for one property",
-        operation_description="Get reservations by the parameter property_id",
+        operation_description="Get every reservation of a property as a list (404 when there are none). "
+                              "Any filter or page parameter switches to a page ordered by start date, "
+                              "as count/next/previous/results.",
         security=[],
         manual_parameters=[openapi.Parameter('property_id',
                                              openapi.IN_PATH,
                                              description="Property ID you want to look up.",
-                                             type=openapi.TYPE_STRING)],
+                                             type=openapi.TYPE_STRING)] + LISTING_PARAMETERS,
         responses={
+            '400': 'Bad request, e.g: unknown status or malformed dates',
             '404': 'Property or reservations Not Found',
+            '304': 'Not Modified',
             '200': ReservationSerializer
         }
     )
     def get(self, request, property_id):
-        try:
-            # Check if the reservation exists
-            property_instance = Property.objects.get(property_id=property_id)
-        except Property.DoesNotExist:
-            # Return a 404 response if the reservation does not exist
+        # Check if the property exists
+        if not Property.objects.filter(property_id=property_id).exists():
             return Response({'detail': 'Property not found.'}, status=404)
-        # Get all reservations for the given property
         reservations = Reservation.objects.filter(property=property_id)
+        paged = listing_requested(request.query_params)
+        if paged:
+            try:
+                reservations = filter_reservations(reservations, request.query_params)
+            except ValueError as error:
+                return Response({'detail': str(error)}, status=400)
+        if stream_requested(request):
+            if paged:
+                return ndjson_response(reservations.order_by('start_date', 'id'), ReservationSerializer())
+            if not reservations.exists():
+                return Response({'detail': 'reservations not found.'}, status=404)
+            return ndjson_response(reservations.order_by('id'), ReservationSerializer())
+        validators = queryset_validators(request, reservations, 'updated_at', last_modified=False)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+        if paged:
+            return set_validators(Response(paginated_reservations(request, reservations), status=200), validators)
+        # Evaluate once for both the emptiness check and serialization
+        reservations = list(reservations)
         if not reservations:
-            # Return a 404 response if no comments are found
             return Response({'detail': 'reservations not found.'}, status=404)
-        # Serialize the comments
         serializer = ReservationSerializer(instance=reservations, many=True)
-        # Return the serialized comments
-        return Response(serializer.data, status=200)
+        return set_validators(Response(serializer.data, status=200), validators)
 
 
 class ReservationCreate(APIView):
@@ -69,39 +143,26 @@ class ReservationCreate(APIView):
         property_obj = get_object_or_404(Property, property_id=property_id)
         # Create a serializer with the request data
         serializer = ReservationSerializer(data=request.data)
-        reservations = Reservation.objects.filter(property=property_id)
-        # if property exists, check if there is any reservations conflict to this one
-        if reservations:
-            if serializer.is_valid():
-                # Get the validated start_date and end_date
-                start_date = serializer.validated_data.get('start_date')
-                end_date = serializer.validated_data.get('end_date')
-                status = serializer.validated_data.get('status')
-                if status != 'Pending':
-                    return Response({'detail': 'Status should be pending when create reservation'},
-                                    status=400)
-                # Check if there are any conflicting reservations for the same property
-                conflicting_reservations = Reservation.objects.filter(
-                    Q(property=property_id) &
-                    (Q(status='Approved') | Q(status='Pending')) &
-                    ((Q(start_date__range=[start_date, end_date]) |
-                      Q(end_date__range=[start_date, end_date])) |
-                     (Q(start_date__lte=start_date) & Q(end_date__gte=end_date)))
-                )
-                if conflicting_reservations.exists():
-                    return Response({'detail': 'There is a conflicting reservation for the this property.'},
-                                    status=400)
-
-                serializer.save(tenant=tenant)
-                return Response(serializer.data)
-            else:
-                return Response(serializer.errors, status=400)
-        else:
-            if serializer.is_valid():
-                serializer.save(tenant=tenant)
-                return Response(serializer.data)
-            else:
-                return Response(serializer.errors, status=400)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        # Get the validated start_date and end_date
+        start_date = serializer.validated_data.get('start_date')
+        end_date = serializer.validated_data.get('end_date')
+        status = serializer.validated_data.get('status')
+        if start_date > end_date:
+            return Response({'detail': 'start_date must not be after end_date.'}, status=400)
+        # if the property already has reservations, a new one has to start as pending
+        if status != 'Pending' and Reservation.objects.filter(property=property_id).exists():
+            return Response({'detail': 'Status should be pending when create reservation'},
+                            status=400)
+        try:
+            # Check for conflicting reservations and save while holding the property's booking lock
+            with booking(property_obj.property_id, start_date, end_date, status):
+                serializer.save(tenant=tenant, property=property_obj)
+        except BookingConflict:
+            return Response({'detail': 'There is a conflicting reservation for the this property.'},
+                            status=400)
+        return Response(serializer.data)
 
 
 class ReservationUD(APIView):
@@ -128,7 +189,7 @@ class ReservationUD(APIView):
     def put(self, request, reservation_id):
 
         try:
-            reservation = Reservation.objects.get(id=reservation_id)
+            reservation = Reservation.objects.get(id=reservation_id, property__is_deleted=False)
         except Reservation.DoesNotExist:
             return Response({'detail': 'reservation not found.'}, status=404)
         # if reservation exist, update it
@@ -136,21 +197,18 @@ class ReservationUD(APIView):
         if serializer.is_valid():
             start_date = serializer.validated_data.get('start_date')
             end_date = serializer.validated_data.get('end_date')
-            property_id = serializer.validated_data.get('property')
-            # Check if there are any conflicting reservations for the same property
-            conflicting_reservations = Reservation.objects.filter(
-                Q(property=property_id) &
-                (Q(status='Approved') | Q(status='Pending')) &
-                ((Q(start_date__range=[start_date, end_date]) |
-                  Q(end_date__range=[start_date, end_date])) |
-                 (Q(start_date__lte=start_date) & Q(end_date__gte=end_date)))
-            ).exclude(id=reservation_id)
-
-            if conflicting_reservations.exists():
+            property_obj = serializer.validated_data.get('property')
+            status = serializer.validated_data.get('status', reservation.status)
+            if start_date > end_date:
+                return Response({'detail': 'start_date must not be after end_date.'}, status=400)
+            tenant = reservation.tenant
+            try:
+                # Check for conflicting reservations and save while holding the property's booking lock
+                with booking(property_obj.property_id, start_date, end_date, status, exclude_id=reservation.id):
+                    serializer.save(tenant=tenant)
+            except BookingConflict:
                 return Response({'detail': 'There is a conflicting reservation for the this property.'},
                                 status=400)
-            tenant = reservation.tenant
-            serializer.save(tenant=tenant)
             return Response(serializer.data, status=200)
         else:
             return Response(serializer.errors)
@@ -171,7 +229,7 @@ class ReservationUD(APIView):
     def delete(self, request, reservation_id):
         tenant = request.user
         try:
-            reservation = Reservation.objects.get(id=reservation_id)
+            reservation = Reservation.objects.get(id=reservation_id, property__is_deleted=False)
         except Reservation.DoesNotExist:
             return Response({'detail': 'reservation not found.'}, status=404)
         # if comment exist, delete it
@@ -179,24 +237,202 @@ class ReservationUD(APIView):
         return Response('Deletion successful', status=200)
 
 
-class ReservationGetMyView(APIView):
+class ReservationGetMyView(NDJSONStreamMixin, APIView):
     authentication_classes = (authentication.JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
+    @swagger_auto_schema(
+        operation_summary="Get my reservations",
+        operation_description="Get every reservation of the current user as a list. Any filter or page "
+                              "parameter switches to a page ordered by start date, as "
+                              "count/next/previous/results.",
+        manual_parameters=LISTING_PARAMETERS,
+        responses={
+            '400': 'Bad request, e.g: unknown status or malformed dates',
+            '401': 'Unauthorized',
+            '200': ReservationSerializer
+        }
+    )
     def get(self, request):
         tenant = request.user
-        reservation_queryset = Reservation.objects.filter(tenant=tenant)
+        reservation_queryset = Reservation.objects.filter(tenant=tenant, property__is_deleted=False)
+        paged = listing_requested(request.query_params)
+        if paged:
+            try:
+                reservation_queryset = filter_reservations(reservation_queryset, request.query_params)
+            except ValueError as error:
+                return Response({'detail': str(error)}, status=400)
+        if stream_requested(request):
+            serializer = ReservationSerializer(context={'request': request})
+            return ndjson_response(reservation_queryset.order_by(*(('start_date', 'id') if paged else ('id',))),
+                                   serializer)
+        if paged:
+            return Response(paginated_reservations(request, reservation_queryset), status=200)
         serializer = ReservationSerializer(instance=reservation_queryset, many=True, context={'request': request})
         return Response(serializer.data, status=200)
 
 
-class ReservationAutoUpdateView(APIView):
+class PropertyCalendarView(APIView):
+    permission_classes = (AllowAny,)
+    pk_url_kwarg = 'property_id'
+
+    @swagger_auto_schema(
+        operation_summary="Get the blocked dates of one property",
+        operation_description="Merged, sorted date ranges taken by Approved or Pending reservations "
+                              "within the window. Ranges are inclusive and clipped to the window.",
+        security=[],
+        manual_parameters=[openapi.Parameter('property_id',
+                                             openapi.IN_PATH,
+                                             description="Property ID you want to look up.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('from',
+                                             openapi.IN_QUERY,
+                                             description="First day of the window (YYYY-MM-DD), defaults to today.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('to',
+                                             openapi.IN_QUERY,
+                                             description="Last day of the window (YYYY-MM-DD), defaults to a year "
+                                                         "after from.",
+                                             type=openapi.TYPE_STRING)],
+        responses={
+            '400': 'Bad request, e.g: malformed dates or a window that is too long',
+            '404': 'Property Not Found',
+            '304': 'Not Modified',
+            '200': 'The property_id, from, to and blocked ranges'
+        }
+    )
+    def get(self, request, property_id):
+        try:
+            start_date, end_date = calendar.parse_window(request.query_params)
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=400)
+        if not Property.objects.filter(property_id=property_id).exists():
+            return Response({'detail': 'Property not found.'}, status=404)
+        payload, etag = calendar.property_calendar(property_id, start_date, end_date)
+        validators = Validators(etag, None)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+        return set_validators(Response(payload, status=200), validators)
+
+
+def _range_data(date_range):
+    if date_range is None:
+        return None
+    return {'start_date': date_range[0].isoformat(), 'end_date': date_range[1].isoformat()}
+
+
+def _quote_data(conflict):
+    return {'available': conflict is None, 'conflict': _range_data(conflict)}
+
+
+class AvailabilityQuoteView(APIView):
     permission_classes = (AllowAny,)
+    max_ids = 50
+    max_ranges = 30
 
+    @swagger_auto_schema(
+        operation_summary="Check availability of several date ranges or properties",
+        operation_description="Either up to 30 candidate ranges for one property (property_id and ranges), "
+                              "or one range for up to 50 properties (ids, start_date and end_date). Each "
+                              "answer says whether the range is free and, if not, the blocked range it "
+                              "runs into. Ranges are inclusive; only Approved and Pending stays block dates.",
+        security=[],
+        manual_parameters=[openapi.Parameter('property_id',
+                                             openapi.IN_QUERY,
+                                             description="Property to quote several ranges for.",
+                                             type=openapi.TYPE_INTEGER),
+                           openapi.Parameter('ranges',
+                                             openapi.IN_QUERY,
+                                             description="Comma-separated START/END ranges, e.g. "
+                                                         "2030-01-01/2030-01-05,2030-02-01/2030-02-03.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('ids',
+                                             openapi.IN_QUERY,
+                                             description="Comma-separated property IDs to quote one range for.",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('start_date',
+                                             openapi.IN_QUERY,
+                                             description="First day of the range quoted for ids (YYYY-MM-DD).",
+                                             type=openapi.TYPE_STRING),
+                           openapi.Parameter('end_date',
+                                             openapi.IN_QUERY,
+                                             description="Last day of the range quoted for ids (YYYY-MM-DD).",
+                                             type=openapi.TYPE_STRING)],
+        responses={
+            '400': 'Bad request, e.g: malformed or too many ranges or ids',
+            '404': 'Property Not Found',
+            '200': 'Per range (or per property) available and conflict'
+        }
+    )
     def get(self, request):
-        updated_rows = Reservation.objects.filter(
-            end_date__lt=datetime.now(), status='Approved'
-        ).update(status='Completed')
+        params = request.query_params
+        if ('property_id' in params) == ('ids' in params):
+            return Response({'detail': 'Give either property_id and ranges, or ids with start_date and end_date.'},
+                            status=400)
+        try:
+            if 'property_id' in params:
+                try:
+                    property_ids = [int(params['property_id'])]
+                except ValueError:
+                    raise ValueError('property_id must be an integer.')
+                ranges = [parse_range(value) for value in params.get('ranges', '').split(',') if value.strip()]
+                if not ranges:
+                    raise ValueError('ranges is required.')
+                if len(ranges) > self.max_ranges:
+                    raise ValueError('At most %d ranges can be quoted at once.' % self.max_ranges)
+            else:
+                try:
+                    property_ids = [int(value) for value in params['ids'].split(',') if value.strip()]
+                except ValueError:
+                    raise ValueError('ids must be a comma-separated list of integers.')
+                if not property_ids:
+                    raise ValueError('ids is required.')
+                if len(property_ids) > self.max_ids:
+                    raise ValueError('At most %d ids can be requested at once.' % self.max_ids)
+                ranges = [parse_range('%s/%s' % (params.get('start_date', ''), params.get('end_date', '')))]
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=400)
+        span = max(end_date for _, end_date in ranges) - min(start_date for start_date, _ in ranges)
+        if span.days >= calendar.max_days():
+            return Response({'detail': 'Ranges may span at most %d days.' % calendar.max_days()}, status=400)
+
+        found = set(Property.objects.filter(property_id__in=set(property_ids)).values_list('property_id', flat=True))
+        if 'property_id' in params and not found:
+            return Response({'detail': 'Property not found.'}, status=404)
+        conflicts = quote_ranges(found, ranges)
+        if 'property_id' in params:
+            property_id = property_ids[0]
+            return Response({
+                'property_id': property_id,
+                'results': [dict(_range_data(date_range), **_quote_data(conflict))
+                            for date_range, conflict in zip(ranges, conflicts[property_id])]
+            }, status=200)
+        results = []
+        for property_id in property_ids:
+            if property_id not in found:
+                results.append({'property_id': property_id, 'detail': 'Property not found.'})
+                continue
+            results.append(dict({'property_id': property_id}, **_quote_data(conflicts[property_id][0])))
+        return Response(dict(_range_data(ranges[0]), results=results), status=200)
 
-        return Response({"updated_reservations": updated_rows})
 
+class ReservationAutoUpdateView(APIView):
+    authentication_classes = (authentication.JWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @swagger_auto_schema(
+        operation_summary="Run the reservation status sweep",
+        operation_description="Complete Approved reservations that have ended and expire Pending ones whose "
+                              "start date has passed. Admins only; the sweep normally runs from the "
+                              "sweep_reservations command or the RESERVATION_SWEEP_INTERVAL thread.",
+        responses={
+            '401': 'Unauthorized',
+            '403': 'Forbidden',
+            '200': 'updated_reservations (Approved to Completed) and the counts of each transition'
+        }
+    )
+    def post(self, request):
+        results = sweep()
+        return Response({"updated_reservations": results['approved-to-completed']['updated'],
+                         "transitions": results})
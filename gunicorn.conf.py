@@ -2,3 +2,9 @@ workers = 1
 worker_class = 'sync'
 bind = '0.0.0.0:8000'
 module = 'restify.wsgi:application'
+
+
+def post_worker_init(worker):
+    # Only server workers sweep in the background; it is off unless RESERVATION_SWEEP_INTERVAL is set
+    from apps.reservations.sweeper import start_background_sweeper
+    start_background_sweeper()
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+# Bump when a serializer's output changes, so clients do not keep serving old representations
+REPRESENTATION_VERSION = 1
+
+Validators = namedtuple('Validators', ('etag', 'last_modified'))
+
+
+def queryset_validators(request, queryset, timestamp_field=None, last_modified=True):
+    """
+    ETag and Last-Modified for the representation of queryset, from a single aggregate query.
+
+    The ETag covers the row count, the highest primary key and the newest
+    timestamp, so it changes when rows are added, deleted or saved. It also
+    covers the query string and the negotiated media type, which select the
+    representation. MAX(timestamp) can move backwards when rows are deleted,
+    so Last-Modified should only be sent for single objects
+    (last_modified=False for collections).
+    """
+    aggregates = {'count': Count('pk'), 'version': Max('pk')}
+    if timestamp_field:
+        aggregates['modified'] = Max(timestamp_field)
+    stats = queryset.order_by().aggregate(**aggregates)
+    modified = stats.get('modified')
+    seed = [REPRESENTATION_VERSION, request.get_full_path(), getattr(request, 'accepted_media_type', None),
+            stats['count'], stats['version'], modified.isoformat() if modified else None]
+    etag = '"%s"' % hashlib.sha1(json.dumps(seed).encode('utf-8')).hexdigest()
+    return Validators(etag, modified if last_modified else None)
+
+
+def set_validators(response, validators):
+    response['ETag'] = validators.etag
+    if validators.last_modified is not None:
+        response['Last-Modified'] = http_date(validators.last_modified.timestamp())
+    patch_vary_headers(response, ('Accept', ))
+    # Cached copies must be revalidated, which is what makes the 304 path pay off
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def not_modified(request, validators):
+    """
+    A 304 response when the request's If-None-Match / If-Modified-Since match, else None
+    """
+    timestamp = None
+    if validators.last_modified is not None:
+        timestamp = int(validators.last_modified.timestamp())
+    response = get_conditional_response(request, etag=validators.etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, validators)
+    return response
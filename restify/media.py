@@ -0,0 +1,50 @@
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+@lru_cache(maxsize=8192)
+def media_url(name):
+    """
+    Public URL of a stored file.
+
+    With MEDIA_PUBLIC_BASE_URL set (a bucket or CDN origin serving the files
+    without query string auth) the URL is built from the name alone;
+    otherwise the storage backend is asked once per name.
+    """
+    base_url = getattr(settings, 'MEDIA_PUBLIC_BASE_URL', None)
+    if base_url:
+        return base_url.rstrip('/') + '/' + quote(name, safe='/~')
+    return default_storage.url(name)
+
+
+@receiver(setting_changed)
+def clear_media_url_cache(setting, **kwargs):
+    if setting in ('MEDIA_PUBLIC_BASE_URL', 'MEDIA_URL', 'DEFAULT_FILE_STORAGE', 'STORAGES'):
+        media_url.cache_clear()
+
+
+def absolute_media_url(name, request=None):
+    url = media_url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class MediaImageField(serializers.ImageField):
+    """
+    ImageField whose output URL comes from media_url() instead of the storage backend
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        context = self.context
+        request = context.get('request') if isinstance(context, dict) else None
+        return absolute_media_url(value.name, request)
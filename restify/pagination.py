@@ -0,0 +1,141 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination, _positive_int
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class DefaultLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination that still pages when the client sends no limit
+    """
+    default_limit = 20
+
+
+class KeysetPagination:
+    """
+    Cursor (keyset) pagination over an explicit ordering.
+
+    ordering is a list of (field, descending) pairs whose last entry must be
+    unique, e.g. [('price', False), ('property_id', False)]. Ordering fields
+    must not be NULL; annotate with Coalesce first. Each page continues with
+    a WHERE on the previous page's last row, so deep pages cost the same as
+    the first one and no COUNT(*) is needed.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    limit_query_param = 'limit'
+    default_limit = 20
+    max_limit = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering):
+        self.ordering = list(ordering)
+
+    @classmethod
+    def requested(cls, request):
+        """
+        Whether the client opted into cursor pagination
+        """
+        return request.query_params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in request.query_params
+
+    @classmethod
+    def count_requested(cls, request):
+        return request.query_params.get(cls.count_query_param, '').lower() in ('1', 'true')
+
+    def order_by(self, reverse=False):
+        return ['-' + field if descending != reverse else field for field, descending in self.ordering]
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def signature(self):
+        return ','.join(self.order_by())
+
+    def encode_cursor(self, row, reverse):
+        position = [getattr(row, field) for field, _ in self.ordering]
+        payload = json.dumps({'o': self.signature(), 'p': position, 'r': reverse}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor from another sort order points at an unrelated position
+        if payload.get('o') != self.signature() or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def keyset_filter(self, position, reverse):
+        """
+        Rows strictly after position in the (possibly reversed) ordering
+        """
+        clauses = []
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {name: value for (name, _), value in zip(self.ordering[:index], position[:index])}
+            clauses.append(Q(**equal, **{'%s__%s' % (field, lookup): position[index]}))
+        return reduce(lambda left, right: left | right, clauses)
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        limit = self.get_limit(request)
+        encoded = request.query_params.get(self.cursor_query_param)
+        position, reverse = self.decode_cursor(encoded) if encoded else (None, False)
+
+        queryset = queryset.order_by(*self.order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(rows[-1], reverse=False)
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'offset')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+
+def paginate_ordered(request, queryset, ordering):
+    """
+    Page queryset with keyset pagination when the client opts in, else limit/offset.
+
+    Returns (paginator, rows, count); in cursor mode count is None unless ?count=1.
+    """
+    if KeysetPagination.requested(request):
+        paginator = KeysetPagination(ordering)
+        rows = paginator.paginate_queryset(queryset, request)
+        # COUNT(*) over the whole result set is only run on request
+        count = queryset.count() if KeysetPagination.count_requested(request) else None
+    else:
+        paginator = DefaultLimitOffsetPagination()
+        rows = paginator.paginate_queryset(queryset.order_by(*KeysetPagination(ordering).order_by()), request)
+        count = paginator.count
+    return paginator, rows, count
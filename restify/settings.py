@@ -79,6 +79,11 @@ AUTH_USER_MODEL = 'accounts.User'
 # Databases & File Storages
 
 DATABASES = {'default': env.db()}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # The default in-memory test database cannot be shared by the threads of the concurrent booking tests
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', os.path.join(BASE_DIR, 'test_db.sqlite3'))
+
 STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
@@ -89,6 +94,23 @@ GS_BUCKET_NAME = env("GS_BUCKET_NAME")
 GS_FILE_OVERWRITE = True
 GS_QUERYSTRING_AUTH = False
 
+# Caches
+
+# Shared by every worker and instance, so that invalidations (search generations, calendar
+# versions, availability tokens) made while handling a write reach all of them. The default
+# database cache table is created by the properties migrations; set CACHE_URL (e.g.
+# redis://host:6379/0) to use another shared backend.
+CACHES = {'default': env.cache('CACHE_URL', default='dbcache://restify_cache')}
+
+CACHES['default'].setdefault('TIMEOUT', 300)
+
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache':
+    CACHES['default'].setdefault('OPTIONS', {}).setdefault('MAX_ENTRIES', 20000)
+
+SEARCH_CACHE_ALIAS = 'default'
+
+SEARCH_CACHE_TIMEOUT = 60
+
 REST_FRAMEWORK = {
     "NON_FIELD_ERRORS_KEY": "error",
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -211,6 +233,31 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
 
+# Availability index (apps.reservations.availability)
+
+AVAILABILITY_INDEX_ENABLED = True
+
+AVAILABILITY_INDEX_TTL = 300
+
+AVAILABILITY_INDEX_SEARCH_LIMIT = 500
+
+# Holds the version tokens that tell every process when its entries are stale; must be shared
+AVAILABILITY_INDEX_CACHE_ALIAS = 'default'
+
+# Property booking calendars (apps.reservations.calendar)
+
+CALENDAR_CACHE_TIMEOUT = 300
+
+CALENDAR_MAX_DAYS = 731
+
+# Reservation status sweeper (apps.reservations.sweeper)
+
+RESERVATION_SWEEP_BATCH_SIZE = 500
+
+# Seconds between sweeps in a background thread of each gunicorn worker (gunicorn.conf.py);
+# 0 leaves sweeping to the sweep_reservations command
+RESERVATION_SWEEP_INTERVAL = env.int('RESERVATION_SWEEP_INTERVAL', default=0)
+
 # CORS Settings
 
 CLOUDRUN_SERVICE_URLS = [
@@ -238,3 +285,31 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 SESSION_COOKIE_SECURE = True
 
 CSRF_COOKIE_SECURE = True
+
+# NDJSON streaming of large listings (restify.streaming)
+
+STREAMING_CHUNK_SIZE = 500
+
+# Background tasks (restify.tasks)
+
+BACKGROUND_TASK_WORKERS = 2
+
+BACKGROUND_TASKS_EAGER = False
+
+# Direct image uploads (apps.properties.uploads)
+
+SIGNED_UPLOAD_TTL = 900
+
+SIGNED_UPLOAD_MAX_BYTES = DATA_UPLOAD_MAX_MEMORY_SIZE
+
+IMAGE_BATCH_MAX_FILES = 30
+
+IMAGE_UPLOAD_WORKERS = 4
+
+# Public base URL of stored media (restify.media); files are public, see GS_QUERYSTRING_AUTH
+
+MEDIA_PUBLIC_BASE_URL = env('MEDIA_PUBLIC_BASE_URL', default='https://storage.googleapis.com/%s/' % GS_BUCKET_NAME)
+
+# Rows deleted per transaction when purging a deleted property (apps.properties.purge)
+
+PROPERTY_PURGE_BATCH_SIZE = 500
@@ -0,0 +1,68 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def _dump(row):
+    return json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line.
+
+    Listings are streamed by ndjson_response(); the renderer handles the
+    ordinary responses (errors, small payloads) of a request that asked for
+    NDJSON, and lets content negotiation accept the media type at all.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(_dump(row) for row in rows)
+
+
+class NDJSONStreamMixin:
+    """
+    APIView mixin accepting Accept: application/x-ndjson next to the default renderers
+    """
+    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (NDJSONRenderer, )
+
+
+def stream_requested(request):
+    """
+    Whether the client asked for a streamed listing, with ?stream=1 or Accept: application/x-ndjson
+    """
+    if request.query_params.get('stream') in ('1', 'true'):
+        return True
+    return isinstance(getattr(request, 'accepted_renderer', None), NDJSONRenderer)
+
+
+def ndjson_response(queryset, serializer, chunk_size=None):
+    """
+    Stream queryset as NDJSON, serializing one row at a time with the (non-many) serializer.
+
+    Rows are read with iterator() so neither the model instances nor the
+    rendered output of the whole listing are ever held in memory.
+    """
+    chunk_size = chunk_size or getattr(settings, 'STREAMING_CHUNK_SIZE', 500)
+
+    def rows():
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            yield _dump(serializer.to_representation(instance))
+
+    response = StreamingHttpResponse(rows(), content_type=NDJSON_MEDIA_TYPE)
+    # Ask reverse proxies to pass lines through instead of buffering the body
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,52 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                                           thread_name_prefix='restify-task')
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__qualname__)
+
+
+def _run_in_worker(func, args, kwargs):
+    try:
+        _run(func, args, kwargs)
+    finally:
+        # Worker threads open their own connections; do not leave them idle between tasks
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in the background worker pool once the current transaction commits.
+
+    With BACKGROUND_TASKS_EAGER the task runs inline instead, which keeps
+    tests and management commands deterministic. Failures are logged, never
+    raised to the caller.
+    """
+    def schedule():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            _run(func, args, kwargs)
+        else:
+            _get_executor().submit(_run_in_worker, func, args, kwargs)
+
+    transaction.on_commit(schedule)